@@ -0,0 +1,66 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : bench_analytics.py
+# @Project : NKU-EAMIS
+
+"""
+Benchmark of the grade analytics on a synthetic cohort.
+
+Usage:
+    python3 benchmarks/bench_analytics.py [<students>] [<courses>]
+
+The cohort has <students> students (20000 by default) with <courses> grades each (50 by default) over 8 semesters,
+some of them without a numeric score. Building it from records is timed separately from the aggregates.
+"""
+
+import os
+import sys
+import time
+import random
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from nkueamis import analytics
+
+SEMESTERS = ['%d-%d:%d' % (2014 + i // 2, 2015 + i // 2, i % 2 + 1) for i in range(8)]
+SCORES = ['%d' % i for i in range(60, 101)] * 3 + ['--', '', '85 (补考)', '通过']
+
+
+# generate the grade records of a cohort
+def cohort_records(students, courses, seed=0):
+    r = random.Random(seed)
+    for student in range(students):
+        for course in range(courses):
+            yield {'type': 'grade', 'username': '2017%05d' % student, 'semester': SEMESTERS[course * 8 // courses],
+                   'category': r.choice(analytics.CATEGORIES), 'name': '课程%d' % course,
+                   'credit': r.choice(['1', '2', '3', '1.5']), 'score': r.choice(SCORES)}
+
+
+def timed(name, func):
+    start = time.perf_counter()
+    result = func()
+    print('%-28s %10.1f' % (name, (time.perf_counter() - start) * 1e3))
+    return result
+
+
+def main():
+    students = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    courses = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    records = list(cohort_records(students, courses))
+    print('%d students x %d courses, %d rows' % (students, courses, len(records)))
+    print('%-28s %10s' % ('step', 'ms'))
+    grades = timed('from records', lambda: analytics.GradeArrays.from_records(records))
+    start = time.perf_counter()
+    averages = timed('averages', lambda: grades.averages()[0])
+    timed('averages by category', lambda: grades.averages(('student', 'category'), 'BCD'))
+    timed('averages by semester', lambda: grades.averages(('student', 'semester')))
+    timed('cumulative', lambda: grades.cumulative())
+    timed('what-if, 100 scenarios', lambda: grades.project([3, 2, 2], [[60 + i % 41] * 3 for i in range(100)]))
+    timed('percentile ranks', lambda: analytics.percentile_ranks(averages))
+    timed('distribution', lambda: analytics.distribution(averages))
+    print('%-28s %10.1f' % ('all aggregates', (time.perf_counter() - start) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
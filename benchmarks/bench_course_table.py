@@ -0,0 +1,45 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : bench_course_table.py
+# @Project : NKU-EAMIS
+
+"""
+Benchmark of the course table parser on synthetic timetables.
+
+Usage:
+    python3 benchmarks/bench_course_table.py
+
+The time per activity should stay flat while the number of activities grows.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nkueamis.nkueamis import parse_course_table
+from nkueamis.standin import course_table_page
+
+
+# time the parser on a page, return the best seconds of some runs
+def bench(content, repeat=5):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        parse_course_table(content)
+        cost = time.perf_counter() - start
+        best = cost if best is None else min(best, cost)
+    return best
+
+
+def main():
+    print('%10s %12s %12s %14s' % ('activities', 'bytes', 'ms', 'us/activity'))
+    for n in (100, 200, 400, 800, 1600, 3200):
+        content = course_table_page(n)
+        cost = bench(content)
+        print('%10d %12d %12.2f %14.2f' % (n, len(content), cost * 1e3, cost * 1e6 / n))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : bench_daemon.py
+# @Project : NKU-EAMIS
+
+"""
+Benchmark of the daemon against a new nkueamis process for every query.
+
+Usage:
+    python3 benchmarks/bench_daemon.py [<clients>]
+
+Against the stand-in, it times a query of the grades by running `nkueamis -g ABCDE --format=json` (with its session
+cached on disk), then the same query through the JSON API of `nkueamis --daemon`, fetched and cached, and the exams
+from <clients> concurrent clients (50 by default) sharing one fetch, counting the requests that reached the stand-in.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from nkueamis.standin import StandIn
+
+ACCOUNT = ['-u', '20170001', '-p', 'pw']
+
+
+def request(port, token, method, path, body=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    conn.request(method, path, body=json.dumps(body) if body else None, headers={'Authorization': 'Bearer ' + token})
+    response = conn.getresponse()
+    data = json.loads(response.read())
+    conn.close()
+    return response.status, data
+
+
+def timed(name, server, func):
+    server.reset_counts()
+    start = time.perf_counter()
+    func()
+    print('%-28s %10.1f %10d' % (name, (time.perf_counter() - start) * 1e3, server.total_requests()))
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    cache_dir = tempfile.mkdtemp(prefix='nkueamis-bench-')
+    with StandIn() as server:
+        env = dict(os.environ, NKUEAMIS_HOME_URL=server.url, XDG_CACHE_HOME=cache_dir, PYTHONPATH=ROOT)
+        cli = [sys.executable, '-m', 'nkueamis.nkueamis', '-g', 'ABCDE', '--format=json'] + ACCOUNT
+        subprocess.run(cli, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        daemon = subprocess.Popen([sys.executable, '-m', 'nkueamis.nkueamis', '--daemon', '--listen=127.0.0.1:0'],
+                                  env=env, stderr=subprocess.PIPE, universal_newlines=True)
+        try:
+            port = int(daemon.stderr.readline().split(',')[0].rsplit(':', 1)[1])
+            daemon.stderr.readline()  # the token file is written before listening
+            with open(os.path.join(cache_dir, 'nkueamis', 'daemon.token')) as f:
+                token = f.read()
+            request(port, token, 'POST', '/login', {'username': ACCOUNT[1], 'password': ACCOUNT[3]})
+            path = '/users/%s/grades?categories=ABCDE' % ACCOUNT[1]
+            print('%-28s %10s %10s' % ('query', 'ms', 'requests'))
+            timed('cli, cached session', server, lambda: subprocess.run(
+                cli, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+            timed('daemon, first', server, lambda: request(port, token, 'GET', path))
+            timed('daemon, cached', server, lambda: request(port, token, 'GET', path))
+            timed('daemon, %d clients, exams' % clients, server, lambda: list(ThreadPoolExecutor(clients).map(
+                lambda i: request(port, token, 'GET', '/users/%s/exams' % ACCOUNT[1]), range(clients))))
+        finally:
+            daemon.terminate()
+            daemon.wait()
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
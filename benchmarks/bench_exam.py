@@ -0,0 +1,87 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : bench_exam.py
+# @Project : NKU-EAMIS
+
+"""
+Benchmark and fuzz corpus of the exam table parser.
+
+Usage:
+    python3 benchmarks/bench_exam.py [--legacy]
+
+Large pages and malformed pages (rows without the '正常' status, unclosed rows and cells, stray '<' and garbage)
+must all be parsed in time linear to their size. With --legacy the regex parser used before is timed on the
+normal pages for comparison, and on pages without any '正常' row, where it already takes seconds for two rows.
+"""
+
+import os
+import re
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nkueamis.nkueamis import parse_exam_table
+from nkueamis.standin import exam_page
+
+MAX_SECONDS_PER_MB = 2.0
+
+
+# generate the fuzz corpus of malformed pages of about n rows
+def fuzz_corpus(n, seed=0):
+    r = random.Random(seed)
+    page = exam_page(n, seed)
+    garbage = ''.join(r.choice('<>/td正常tr "=\n0123456789') for i in range(len(page)))
+    return [
+        ('no status', exam_page(n, seed, status_ratio=0)),
+        ('no arrangement', exam_page(n, seed, arranged_ratio=0)),
+        ('unclosed rows', page.replace('</tr>', '')),
+        ('unclosed cells', page.replace('</td>', '')),
+        ('stray <', page.replace('<td>', '<td><<')),
+        ('cells only', '<td>1234</td><td>' * n),
+        ('rows only', '<tr>' * n * 10),
+        ('truncated', page[:len(page) // 2]),
+        ('garbage', garbage),
+    ]
+
+
+# the regex parser used before, for comparison
+def legacy_parse(text):
+    text = re.sub('<font color="BBC4C3">exam.*?noArrange</font>', '><', text)
+    pattern = re.compile('<td>\\d{4}</td><td>(.*?)</td><td>.*?</td>.*?<td>>*'
+                         '(.*?)<*</td>.*?<td>>*(.*?)<*</td>.*?<td>.*?>(.*?)<.*?</td>.*?<td>正常</td>', re.S)
+    return pattern.findall(text)
+
+
+def bench(parse, content):
+    start = time.perf_counter()
+    result = parse(content)
+    return time.perf_counter() - start, len(result)
+
+
+def main():
+    legacy = '--legacy' in sys.argv
+    print('%-16s %8s %10s %10s %8s %12s' % ('page', 'rows', 'KB', 'ms', 'exams', 'legacy ms'))
+    failed = False
+    for n in (100, 1000, 10000):
+        for name, content in [('normal', exam_page(n))] + fuzz_corpus(n):
+            cost, found = bench(parse_exam_table, content)
+            size = len(content.encode())
+            legacy_cost = ''
+            if legacy and name == 'normal':
+                legacy_cost = '%.2f' % (bench(legacy_parse, content)[0] * 1e3)
+            print('%-16s %8d %10.1f %10.2f %8d %12s' % (name, n, size / 1024, cost * 1e3, found, legacy_cost))
+            if cost > MAX_SECONDS_PER_MB * max(size, 1 << 20) / (1 << 20):
+                print('  ^ slower than %.1fs per MB' % MAX_SECONDS_PER_MB)
+                failed = True
+    if legacy:
+        for n in (1, 2):
+            content = exam_page(n, status_ratio=0)
+            print('legacy on %d row(s) without status, %d bytes: %.1f ms'
+                  % (n, len(content.encode()), bench(legacy_parse, content)[0] * 1e3))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : bench_search.py
+# @Project : NKU-EAMIS
+
+"""
+Benchmark of the full-text search over a synthetic catalog of electable courses.
+
+Usage:
+    python3 benchmarks/bench_search.py [<courses>]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nkueamis.search import CourseIndex
+from nkueamis.standin import synthetic_catalog
+
+QUERIES = ['数学', '高等数学', '英语 ^王', '^0001', '计算机 网络', 'iii', '津南a', '王伟', '不存在的课程', '学']
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    courses = synthetic_catalog(n)
+    start = time.perf_counter()
+    index = CourseIndex(courses)
+    print('build index of %d courses: %.1f ms' % (n, (time.perf_counter() - start) * 1e3))
+    print('%-16s %8s %10s' % ('query', 'results', 'ms'))
+    for query in QUERIES:
+        best = None
+        for i in range(20):
+            start = time.perf_counter()
+            result = index.search(query)
+            cost = time.perf_counter() - start
+            best = cost if best is None else min(best, cost)
+        print('%-16s %8d %10.3f' % (query, len(result), best * 1e3))
+
+
+if __name__ == '__main__':
+    main()
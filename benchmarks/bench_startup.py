@@ -0,0 +1,76 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : bench_startup.py
+# @Project : NKU-EAMIS
+
+"""
+Benchmark of the import time and the cold start of every CLI mode.
+
+Usage:
+    python3 benchmarks/bench_startup.py [<runs>]
+
+Each mode runs in a new process against the stand-in server, with empty caches. The heavy modules it loaded are
+listed, and 'eager import' is the import time the module had when it imported all of them up front.
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from nkueamis.standin import StandIn
+
+HEAVY_MODULES = ['requests', 'bs4', 'prettytable', 'concurrent.futures']
+ACCOUNT = ['-u', '20170001', '-p', 'pw']
+MODES = [
+    ('help', ['-h']),
+    ('std detail', ACCOUNT),
+    ('grades', ['-g', 'ABCDE'] + ACCOUNT),
+    ('course table', ['-c'] + ACCOUNT),
+    ('exams', ['-e'] + ACCOUNT),
+    ('exams jsonl', ['-e', '--format=jsonl'] + ACCOUNT),
+    ('search', ['--search', '数学'] + ACCOUNT),
+]
+
+
+# run python in a new process with empty caches, return (milliseconds, the heavy modules imported)
+def run(args, env):
+    cache_dir = tempfile.mkdtemp(prefix='nkueamis-bench-')
+    env = dict(env, XDG_CACHE_HOME=cache_dir, PYTHONPATH=ROOT)
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, '-X', 'importtime'] + args, env=env, stdin=subprocess.DEVNULL,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    cost = (time.perf_counter() - start) * 1e3
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    imported = set(line.rsplit('|', 1)[-1].strip() for line in process.stderr.decode().splitlines()
+                   if line.startswith('import time:'))
+    return cost, [i for i in HEAVY_MODULES if i in imported]
+
+
+def best(args, env, runs):
+    results = [run(args, env) for i in range(runs)]
+    return min(i[0] for i in results), results[0][1]
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    env = dict(os.environ)
+    print('%-16s %10s  %s' % ('mode', 'ms', 'heavy modules'))
+    for name, modules in [('import', ['nkueamis.nkueamis']),
+                          ('eager import', ['nkueamis.nkueamis'] + HEAVY_MODULES)]:
+        cost, imported = best(['-c', 'import ' + ', '.join(modules)], env, runs)
+        print('%-16s %10.1f  %s' % (name, cost, ' '.join(imported)))
+    with StandIn() as server:
+        env['NKUEAMIS_HOME_URL'] = server.url
+        for name, args in MODES:
+            cost, imported = best(['-m', 'nkueamis.nkueamis'] + args, env, runs)
+            print('%-16s %10.1f  %s' % (name, cost, ' '.join(imported)))
+
+
+if __name__ == '__main__':
+    main()
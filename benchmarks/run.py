@@ -0,0 +1,156 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : run.py
+# @Project : NKU-EAMIS
+
+"""
+Usage:
+    run.py [--update] [--check-time] [--tolerance=<ratio>] [--size=<rows>] [--latency=<seconds>]
+
+End-to-end benchmark suite against the offline stand-in server (nkueamis/standin.py), run it with
+`python3 benchmarks/run.py`. It times every parser on synthetic pages, and every CLI mode in a fresh process with
+empty caches (and some of them again with the caches a first run left) while counting the requests it sends.
+The results are compared with benchmarks/baseline.json: the run fails when a case sends more requests than its
+baseline. The baseline times were taken on another machine, so a case slower than its baseline times the tolerance
+only fails the run with --check-time, e.g. against a baseline updated on the same machine. --update rewrites the
+baseline.
+
+Options:
+    --update                write the results as the new baseline
+    --check-time            also fail when a case is slower than its baseline times the tolerance
+    --tolerance=<ratio>     allowed slowdown against the baseline [default: 1.5]
+    --size=<rows>           rows of the synthetic pages [default: 200]
+    --latency=<seconds>     delay of every response of the stand-in [default: 0.005]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from docopt import docopt
+from nkueamis import nkueamis, standin
+
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+MIN_MS = 5.0  # differences below this are noise
+REPEAT = 5
+CLI_REPEAT = 3
+CLI_CASES = [
+    ('help', ['-h']),
+    ('std detail', []),
+    ('grades', ['-g', 'ABCDE']),
+    ('course table', ['-c']),
+    ('course table of a semester', ['-c', '-s', '2016-2017:2']),
+    ('course tables of a range', ['-c', '-s', '2014-2015:1', '--to=2018-2019:2']),
+    ('exams', ['-e']),
+    ('search', ['--search', '数学']),
+    ('all parallel', ['-g', 'ABCDE', '-c', '-e', '--parallel']),
+]
+# cases run again after a first run has filled the caches (session, semester index, catalog)
+WARM_CLI_CASES = [
+    ('exams, warm', ['-e']),
+    ('exams of a semester, warm', ['-e', '-s', '2016-2017:2']),
+    ('search, warm', ['--search', '数学']),
+    ('course tables of a range, warm', ['-c', '-s', '2014-2015:1', '--to=2018-2019:2']),
+]
+
+
+class Response(object):
+    def __init__(self, text):
+        self.content = text.encode()
+
+
+# get the parser cases as (name, function to time)
+def parser_cases(size):
+    grade = Response(standin.grade_page(size))
+    course = Response(standin.course_table_page(size))
+    exam = standin.exam_page(size)
+    elect = standin.elect_data_page(size * 10)
+    return [
+        ('get_specified_grade', lambda: nkueamis.get_specified_grade(grade, 'ABCDE')),
+        ('get_course_info', lambda: nkueamis.get_course_info(course)),
+        ('parse_exam_table', lambda: nkueamis.parse_exam_table(exam)),
+        ('get_course_data', lambda: (nkueamis.parse_course_data(elect), nkueamis.get_course_arrange(elect))),
+    ]
+
+
+# get the best milliseconds of some calls
+def best_ms(func, repeat=REPEAT):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        cost = (time.perf_counter() - start) * 1e3
+        best = cost if best is None else min(best, cost)
+    return best
+
+
+# run the CLI once in a new process with empty caches, or after a first run when warm, return (milliseconds, requests)
+def run_cli(server, args, warm=False):
+    cache_dir = tempfile.mkdtemp(prefix='nkueamis-bench-')
+    env = dict(os.environ, NKUEAMIS_HOME_URL=server.url, XDG_CACHE_HOME=cache_dir, PYTHONPATH=ROOT)
+    for i in range(2 if warm else 1):
+        server.reset_counts()
+        start = time.perf_counter()
+        process = subprocess.run([sys.executable, '-m', 'nkueamis.nkueamis'] + args + ['-u', '20170001', '-p', 'pw'],
+                                 env=env, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        cost = (time.perf_counter() - start) * 1e3
+        if process.returncode:
+            raise RuntimeError('nkueamis %s failed:\n%s' % (' '.join(args), process.stderr.decode()))
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    return cost, server.total_requests()
+
+
+def main():
+    args = docopt(__doc__)
+    tolerance = float(args['--tolerance'])
+    size = int(args['--size'])
+    results = {'parsers': {}, 'cli': {}}
+    for name, func in parser_cases(size):
+        results['parsers'][name] = {'ms': best_ms(func)}
+    with standin.StandIn(size=size, latency=float(args['--latency'])) as server:
+        for name, cli_args, warm in [i + (False,) for i in CLI_CASES] + [i + (True,) for i in WARM_CLI_CASES]:
+            runs = [run_cli(server, cli_args, warm) for i in range(CLI_REPEAT)]
+            results['cli'][name] = {'ms': min(i[0] for i in runs), 'requests': max(i[1] for i in runs)}
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, encoding='utf-8') as f:
+            baseline = json.load(f)
+    failed = []
+    print('%-8s %-28s %10s %10s %9s %9s' % ('kind', 'case', 'ms', 'base ms', 'requests', 'base req'))
+    for kind in ('parsers', 'cli'):
+        for name, result in results[kind].items():
+            base = baseline.get(kind, {}).get(name, {})
+            mark = ''
+            more_requests = base and result.get('requests', 0) > base.get('requests', 0)
+            slower = base and result['ms'] > max(base['ms'] * tolerance, base['ms'] + MIN_MS)
+            if more_requests:
+                mark += ' more requests'
+            if slower:
+                mark += ' slower' if args['--check-time'] else ' slower (not checked)'
+            if more_requests or (slower and args['--check-time']):
+                failed.append(name)
+            print('%-8s %-28s %10.1f %10s %9s %9s%s' % (
+                kind, name, result['ms'], '%.1f' % base['ms'] if base else '-', result.get('requests', ''),
+                base.get('requests', '') if base else '-', mark))
+
+    if args['--update']:
+        results['size'] = size
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print('Baseline written to %s' % BASELINE_PATH)
+    elif failed:
+        print('Regressions: %s' % ', '.join(failed))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : analytics.py
+# @Project : NKU-EAMIS
+
+"""
+Usage:
+    analytics <records_file> [-g <categories>] [-u <username>] [--what-if=<courses>]
+
+Run it with `python3 -m nkueamis.analytics`. Grade analytics of the grade records written by `nkueamis --format`,
+e.g. a cohort exported with `nkueamis --batch accounts.csv -g ABCDE --format=jsonl > cohort.jsonl`. It needs NumPy
+(`pip install nkueamis[analytics]`).
+
+The grades are kept as parallel arrays, one element per grade row: the student, the category and the semester (when
+the records have one) as integer codes, and the credits and the score as floats, NaN when the score isn't a number
+('--', '通过') or the credits can't be parsed. Such rows are counted in `unscored`, not silently dropped. Every
+aggregate is a weighted bincount over a combined code, so any grouping of students, categories and semesters takes a
+single pass over the arrays, which handles millions of rows in well under a second.
+
+Options:
+    -g <categories>         the course categories to count, e.g. BCD [default: ABCDE]
+    -u <username>           show the averages of a student and their percentile rank in the cohort
+    --what-if=<courses>     the average of every student after more courses, like '3:90,2:85' (credits:score)
+"""
+
+import re
+import csv
+import json
+from itertools import count, repeat
+from collections import defaultdict
+
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError('nkueamis.analytics needs NumPy, install it with `pip install nkueamis[analytics]`')
+
+CATEGORIES = 'ABCDE'
+SCORE_PATTERN = re.compile('^\\s*(\\d+(?:\\.\\d+)?)')
+BINS = (0, 60, 70, 80, 90, 100)
+
+
+# code the values by their first occurrence, return (the codes, the distinct values)
+def encode(values, length=-1):
+    codes = defaultdict(count().__next__)  # a new value gets the next code
+    return np.fromiter(map(codes.__getitem__, values), dtype=np.intp, count=length), list(codes)
+
+
+# parse values like '85 (补考)' or 85 as floats, NaN if they don't start with a number; each distinct value only once
+def parse_numbers(values, length=-1):
+    codes, distinct = encode(values, length)
+    parsed = np.full(len(distinct), np.nan)
+    for i, value in enumerate(distinct):
+        number = SCORE_PATTERN.match(str(value))
+        if number:
+            parsed[i] = float(number.group(1))
+    return parsed[codes]
+
+
+class GradeArrays(object):
+    def __init__(self, student, category, semester, credit, score, usernames=('',), semesters=()):
+        self.student = np.asarray(student, dtype=np.int32)  # index into usernames
+        self.category = np.asarray(category, dtype=np.int8)  # 0 for A
+        self.semester = np.asarray(semester, dtype=np.int16)  # index into semesters, -1 if unknown
+        self.credit = np.asarray(credit, dtype=np.float64)
+        self.score = np.asarray(score, dtype=np.float64)
+        self.usernames = list(usernames)
+        self.semesters = list(semesters)  # in calendar order
+        self.scored = ~(np.isnan(self.score) | np.isnan(self.credit))
+
+    def __len__(self):
+        return len(self.score)
+
+    # the rows without a numeric score or credits, left out of every aggregate
+    @property
+    def unscored(self):
+        return int(len(self) - self.scored.sum())
+
+    # build the arrays from 'grade' records, e.g. those of records.grade_records or a records file
+    @classmethod
+    def from_records(cls, grade_records):
+        rows = [record for record in grade_records if record.get('type') == 'grade']
+
+        # the values of a field in every row, column by column rather than row by row
+        def column(field, default=None):
+            return map(dict.get, rows, repeat(field), repeat(default))
+
+        student, usernames = encode(column('username', ''), len(rows))
+        categories = {cat: i for i, cat in enumerate(CATEGORIES)}
+        category = np.fromiter(map(categories.__getitem__, column('category')), dtype=np.int8, count=len(rows))
+        codes, names = encode(column('semester', ''), len(rows))
+        # renumber the semesters in calendar order, which is the order of their names, with -1 for none
+        semester_names = sorted(set(names) - {'', None})
+        order = np.array([semester_names.index(i) if i else -1 for i in names] or [-1], dtype=np.int16)
+        credit, score = parse_numbers(column('credit'), len(rows)), parse_numbers(column('score'), len(rows))
+        return cls(student, category, order[codes], credit, score, [i or '' for i in usernames], semester_names)
+
+    # build the arrays from the grade book of a student
+    @classmethod
+    def from_grade_book(cls, grade_book, username=''):
+        return cls.from_records({'type': 'grade', 'username': username, 'category': CATEGORIES[cat - 1],
+                                 'credit': row[1], 'score': row[2]}
+                                for cat, rows in grade_book.rows.items() for row in rows)
+
+    # the number of codes of a dimension
+    def size(self, dimension):
+        return {'student': len(self.usernames), 'category': len(CATEGORIES), 'semester': len(self.semesters)}[dimension]
+
+    # the mask of the scored rows in the categories like 'BCD', with a known semester if needed
+    def mask(self, cat_list_str=CATEGORIES, need_semester=False):
+        mask = self.scored & np.isin(self.category, [CATEGORIES.index(i) for i in cat_list_str])
+        if need_semester:
+            mask &= self.semester >= 0
+        return mask
+
+    # sum the credits and credit*score of the categories, shaped by the dimensions, e.g. (students, semesters)
+    def totals(self, dimensions=('student',), cat_list_str=CATEGORIES):
+        mask = self.mask(cat_list_str, 'semester' in dimensions)
+        shape = tuple(self.size(i) for i in dimensions)
+        codes = np.ravel_multi_index(tuple(getattr(self, i)[mask] for i in dimensions), shape)
+        length = int(np.prod(shape))
+        credit = self.credit[mask]
+        credits = np.bincount(codes, credit, length).reshape(shape)
+        weighted = np.bincount(codes, credit * self.score[mask], length).reshape(shape)
+        return credits, weighted
+
+    # the weighted averages and credits shaped by the dimensions, NaN where there are no credits
+    def averages(self, dimensions=('student',), cat_list_str=CATEGORIES):
+        credits, weighted = self.totals(dimensions, cat_list_str)
+        return weighted_average(weighted, credits), credits
+
+    # the cumulative averages and credits of every student up to every semester, shaped (students, semesters)
+    def cumulative(self, cat_list_str=CATEGORIES):
+        credits, weighted = self.totals(('student', 'semester'), cat_list_str)
+        credits, weighted = credits.cumsum(axis=1), weighted.cumsum(axis=1)
+        return weighted_average(weighted, credits), credits
+
+    # the average of every student after the courses of each scenario, shaped (students, scenarios)
+    # credits are those of the new courses, shaped (courses,), and scores the ones of each scenario (scenarios, courses)
+    def project(self, credits, scores, cat_list_str=CATEGORIES):
+        credits = np.asarray(credits, dtype=np.float64)
+        scores = np.atleast_2d(np.asarray(scores, dtype=np.float64))
+        total_credits, weighted = self.totals(('student',), cat_list_str)
+        return weighted_average(weighted[:, None] + scores.dot(credits)[None, :],
+                                total_credits[:, None] + credits.sum())
+
+
+# divide the weighted sums by the credits, NaN where there are none
+def weighted_average(weighted, credits):
+    average = np.full(np.broadcast(weighted, credits).shape, np.nan)
+    np.divide(weighted, credits, out=average, where=credits > 0)
+    return average
+
+
+# the percentage of the values at or below each value, NaN for NaN
+def percentile_ranks(values):
+    values = np.asarray(values, dtype=np.float64)
+    known = np.sort(values[~np.isnan(values)])
+    ranks = np.full(values.shape, np.nan)
+    if len(known):
+        mask = ~np.isnan(values)
+        ranks[mask] = np.searchsorted(known, values[mask], 'right') * 100.0 / len(known)
+    return ranks
+
+
+# count the values in the bins, the last bin includes its upper edge; NaN values are left out
+def distribution(values, bins=BINS):
+    values = np.asarray(values, dtype=np.float64)
+    counts, edges = np.histogram(values[~np.isnan(values)], bins)
+    return counts, edges
+
+
+# read the records of a JSON, JSON Lines or CSV file written by `nkueamis --format`
+def load_records(path):
+    with open(path, encoding='utf-8') as f:
+        content = f.read()
+    first = content.lstrip()[:1]
+    if first == '[':
+        return json.loads(content)
+    if first == '{':
+        return [json.loads(line) for line in content.splitlines() if line.strip()]
+    return list(csv.DictReader(content.splitlines()))
+
+
+# parse courses like '3:90,2:85' as (credits, scores)
+def parse_courses(courses):
+    pairs = [i.split(':') for i in courses.split(',')]
+    return [float(i[0]) for i in pairs], [float(i[1]) for i in pairs]
+
+
+def format_number(value):
+    return '-' if np.isnan(value) else '%.2f' % value
+
+
+def main():
+    from docopt import docopt
+    args = docopt(__doc__)
+    cat_list_str = args['-g'].upper()
+    if not cat_list_str or not set(cat_list_str) <= set(CATEGORIES):
+        print('Invalid categories %s, use letters of %s!' % (args['-g'], CATEGORIES))
+        exit(1)
+    grades = GradeArrays.from_records(load_records(args['<records_file>']))
+    averages, credits = grades.averages(('student',), cat_list_str)
+    ranks = percentile_ranks(averages)
+    print('%d grades of %d students, %d without a numeric score' % (len(grades), len(grades.usernames),
+                                                                   grades.unscored))
+    counts, edges = distribution(averages)
+    for count, low, high in zip(counts, edges, edges[1:]):
+        print('%3d-%-3d %6d  %s' % (low, high, count, '#' * int(60 * count / max(counts.max(), 1))))
+    if args['-u']:
+        if args['-u'] not in grades.usernames:
+            print('No grades of %s in %s!' % (args['-u'], args['<records_file>']))
+            exit(1)
+        i = grades.usernames.index(args['-u'])
+        print('%s: average %s of %g credits, percentile rank %s' % (
+            args['-u'], format_number(averages[i]), credits[i], format_number(ranks[i])))
+        category_averages = grades.averages(('student', 'category'), cat_list_str)[0][i]
+        print('  ' + '  '.join('%s %s' % (cat, format_number(category_averages[CATEGORIES.index(cat)]))
+                               for cat in cat_list_str))
+        semester_averages = grades.averages(('student', 'semester'), cat_list_str)[0][i]
+        cumulative = grades.cumulative(cat_list_str)[0][i]
+        for name, average, total in zip(grades.semesters, semester_averages, cumulative):
+            print('  %s %s, cumulative %s' % (name, format_number(average), format_number(total)))
+    if args['--what-if']:
+        projected = grades.project(*parse_courses(args['--what-if']), cat_list_str=cat_list_str)[:, 0]
+        print('What if: average %s -> %s' % (format_number(np.nanmean(averages)), format_number(np.nanmean(projected))))
+        if args['-u']:
+            print('  %s: %s -> %s' % (args['-u'], format_number(averages[i]), format_number(projected[i])))
+
+
+if __name__ == '__main__':
+    main()
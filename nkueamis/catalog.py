@@ -0,0 +1,99 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : catalog.py
+# @Project : NKU-EAMIS
+
+"""
+Catalog of electable courses, indexed in memory and cached on disk per election profile.
+
+A cached catalog is used as it is within CATALOG_TTL seconds; after that the payload is downloaded again,
+and it is only parsed again when its content hash has changed.
+"""
+
+import os
+import json
+import time
+import hashlib
+
+from .session_cache import get_cache_dir, write_private_file
+from .search import CourseIndex
+
+CATALOG_VERSION = 1
+CATALOG_TTL = 600
+CATALOG_DIR = 'catalog'
+
+
+class Catalog(object):
+    def __init__(self, courses, arrange, content_hash='', fetched=0):
+        self.courses = courses  # [(id, no, name, teachers, rooms)]
+        self.arrange = arrange  # id -> [(weekday, unit, week mask)]
+        self.content_hash = content_hash
+        self.fetched = fetched
+        self.by_id = {}
+        self.by_no = {}
+        self.by_name = {}
+        self.index = None
+        for course in courses:
+            self.by_id[course[0]] = course
+            self.by_no.setdefault(course[1], course)
+            self.by_name.setdefault(course[2], []).append(course)
+
+    def __len__(self):
+        return len(self.courses)
+
+    # get the full-text index of the catalog, built on first use
+    def search_index(self):
+        if self.index is None:
+            self.index = CourseIndex(self.courses)
+        return self.index
+
+    # check whether the catalog is older than the ttl
+    def expired(self, ttl=CATALOG_TTL):
+        return time.time() - self.fetched > ttl
+
+
+# hash the raw payload of the catalog
+def hash_content(content):
+    return hashlib.sha1(content.encode()).hexdigest()
+
+
+# get the path of the cached catalog of an election profile
+def catalog_path(profile_id):
+    path = os.path.join(get_cache_dir(), CATALOG_DIR)
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    return os.path.join(path, '%s.json' % profile_id)
+
+
+# load the cached catalog of an election profile, None if missing or written by another version
+def load_catalog(profile_id):
+    try:
+        with open(catalog_path(profile_id), encoding='utf-8') as f:
+            data = json.load(f)
+        if data['version'] != CATALOG_VERSION:
+            return None
+        courses = [tuple(i) for i in data['courses']]
+        arrange = dict((k, [tuple(i) for i in v]) for k, v in data['arrange'].items())
+        return Catalog(courses, arrange, data['hash'], data['fetched'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+# save the catalog of an election profile
+def save_catalog(profile_id, catalog):
+    data = {
+        'version': CATALOG_VERSION,
+        'profile_id': profile_id,
+        'fetched': catalog.fetched,
+        'hash': catalog.content_hash,
+        'courses': catalog.courses,
+        'arrange': catalog.arrange,
+    }
+    write_private_file(catalog_path(profile_id), json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+
+
+# drop the cached catalog of an election profile
+def drop_catalog(profile_id):
+    try:
+        os.remove(catalog_path(profile_id))
+    except OSError:
+        pass
@@ -0,0 +1,60 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : conflict.py
+# @Project : NKU-EAMIS
+
+"""
+Time conflict detection between the timetable and electable courses.
+
+Every (weekday, unit) slot owns WEEK_BITS bits of one big integer, where the n-th bit stands for the n-th week,
+so a whole timetable or course is a single integer and a conflict check is a single bitwise AND.
+"""
+
+WEEK_BITS = 64
+UNIT_COUNT = 14
+
+
+# encode the week pattern like '01111000' into a bitmask, the n-th char for the n-th week
+def week_mask(weeks):
+    mask = 0
+    for i, c in enumerate(weeks[:WEEK_BITS]):
+        if c == '1':
+            mask |= 1 << i
+    return mask
+
+
+# encode (weekday, unit, week mask) triples into one integer
+def encode(triples):
+    value = 0
+    for weekday, unit, mask in triples:
+        value |= mask << ((weekday*UNIT_COUNT + unit)*WEEK_BITS)
+    return value
+
+
+class ConflictIndex(object):
+    def __init__(self):
+        self.busy = 0  # union of all the activities of the timetable
+        self.activities = []  # [(name, encoded)], to tell which course a conflict is with
+        self.candidates = {}  # course id -> encoded
+
+    # add an activity of the timetable
+    def add_busy(self, name, triples):
+        value = encode(triples)
+        self.busy |= value
+        self.activities.append((name, value))
+
+    # add an electable course
+    def add_candidate(self, course_id, triples):
+        self.candidates[course_id] = self.candidates.get(course_id, 0) | encode(triples)
+
+    # check whether an electable course conflicts with the timetable, unknown courses never conflict
+    def conflicts(self, course_id):
+        return bool(self.busy & self.candidates.get(course_id, 0))
+
+    # get the names of the timetable courses that an electable course conflicts with
+    def conflicts_with(self, course_id):
+        value = self.candidates.get(course_id, 0)
+        if not self.busy & value:
+            return []
+        return sorted(set(name for name, busy in self.activities if busy & value))
+
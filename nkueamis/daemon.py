@@ -0,0 +1,262 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : daemon.py
+# @Project : NKU-EAMIS
+
+"""
+A local JSON API over HTTP, used by `nkueamis --daemon`, which keeps the sessions of its users logged in.
+
+The server runs on asyncio, over TCP or a Unix socket, and the blocking fetches from EAMIS run in a pool of threads.
+Every resource (e.g. the grades) is fetched as a model, cached in memory for its own TTL and rendered for each
+request (e.g. the grades of some categories). Identical requests arriving while a fetch is in flight wait for that
+fetch instead of starting another one. The fetches of one account run one at a time on a fork of its session, since
+the server keeps state like the current project per session, and the session is checked and logged in again before
+a fetch when it wasn't used for CHECK_INTERVAL seconds.
+
+Over TCP, where any local process can connect, every request must carry the token of the daemon in an
+'Authorization: Bearer <token>' header; a Unix socket is only usable by its owner and needs none. A user is only
+served after logging in with the password, never from a session cached on disk by another run.
+
+    POST /login                     {"username": ..., "password": ...}
+    GET  /users/<username>/<name>   a resource, with its parameters in the query string
+    GET  /stats                     the counts of cache hits, misses and coalesced requests
+"""
+
+import os
+import hmac
+import json
+import time
+import asyncio
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote
+from concurrent.futures import ThreadPoolExecutor
+
+CHECK_INTERVAL = 60
+MAX_ENTRIES = 1024  # cached results kept before the expired ones are dropped
+MAX_BODY = 64 * 1024
+BACKLOG = 1024  # connections waiting to be accepted
+
+
+class Resource(object):
+    def __init__(self, name, fetch, render, ttl, params=()):
+        self.name = name
+        self.fetch = fetch  # (session, {param: value}) -> model, run in a thread
+        self.render = render  # (model, query) -> JSON-able result
+        self.ttl = ttl
+        self.params = params  # the query parameters the model depends on, part of the cache key
+
+
+class Account(object):
+    def __init__(self, username, password, sess):
+        self.username = username
+        self.password = password  # kept to log in again, only in memory
+        self.sess = sess
+        self.checked = time.time()
+        self.lock = asyncio.Lock()
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super(ApiError, self).__init__(message)
+        self.status = status
+
+
+class Daemon(object):
+    def __init__(self, resources, open_session, check_session, workers=8, token=None):
+        self.resources = {i.name: i for i in resources}
+        self.open_session = open_session  # (username, password) -> logged-in session or None
+        self.token = token  # required in the Authorization header of every request when given
+        self.check_session = check_session  # session -> whether it's still logged in
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.accounts = {}
+        self.logins = {}  # (username, password) -> the task logging it in
+        self.cache = {}  # (username, resource, params) -> (expires, model)
+        self.inflight = {}  # (username, resource, params) -> the task fetching it
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    # run a blocking function in the pool of threads
+    def run_blocking(self, func, *args):
+        return asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    # log a user in with the password
+    async def log_in(self, username, password):
+        task = self.logins.get((username, password))
+        if task is None:
+            task = self.logins[username, password] = asyncio.ensure_future(
+                self.run_blocking(self.open_session, username, password))
+            task.add_done_callback(lambda t: self.logins.pop((username, password), None))
+        sess = await asyncio.shield(task)
+        if sess is None:
+            raise ApiError(401, 'failed to log in as %s, please check the username and password' % username)
+        account = self.accounts.get(username)
+        if account is None:
+            account = self.accounts[username] = Account(username, password, sess)
+        elif account.sess is not sess:
+            async with account.lock:  # not while a fetch uses the old session
+                account.sess.close()
+                account.sess = sess
+                account.password = password
+                account.checked = time.time()
+        return account
+
+    def get_account(self, username):
+        account = self.accounts.get(username)
+        if account is None:
+            raise ApiError(401, 'not logged in as %s, POST /login with the password first' % username)
+        return account
+
+    # get a resource rendered for the query, from the cache, from a fetch in flight or from a new fetch
+    async def query(self, username, name, query):
+        resource = self.resources[name]
+        self.get_account(username)
+        params = {i: query.get(i, '') for i in resource.params}
+        key = (username, name) + tuple(sorted(params.items()))
+        entry = self.cache.get(key)
+        if entry and entry[0] > time.time():
+            self.hits += 1
+            return resource.render(entry[1], query)
+        task = self.inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = self.inflight[key] = asyncio.ensure_future(self.fetch(key, username, resource, params))
+            task.add_done_callback(lambda t: self.inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        return resource.render(await asyncio.shield(task), query)
+
+    async def fetch(self, key, username, resource, params):
+        account = self.get_account(username)
+        async with account.lock:
+            model = await self.run_blocking(self.fetch_blocking, account, resource, params)
+        if len(self.cache) >= MAX_ENTRIES:
+            now = time.time()
+            self.cache = {k: v for k, v in self.cache.items() if v[0] > now}
+        self.cache[key] = (time.time() + resource.ttl, model)
+        return model
+
+    # fetch a resource on a fork of the session of the account, logging in again if the session has expired
+    def fetch_blocking(self, account, resource, params):
+        if time.time() - account.checked > CHECK_INTERVAL and not self.check_session(account.sess):
+            sess = self.open_session(account.username, account.password)
+            if sess is None:
+                raise ApiError(401, 'the session of %s has expired, POST /login again' % account.username)
+            account.sess.close()
+            account.sess = sess
+        account.checked = time.time()
+        sess = account.sess.fork()
+        try:
+            return resource.fetch(sess, params)
+        finally:
+            sess.close()
+
+    def stats(self):
+        return {'accounts': sorted(self.accounts), 'cached': len(self.cache), 'inflight': len(self.inflight),
+                'hits': self.hits, 'misses': self.misses, 'coalesced': self.coalesced, 'errors': self.errors}
+
+    # check the token in the Authorization header of a request, when the daemon has one
+    def authorize(self, headers):
+        if self.token is None:
+            return
+        scheme, _, token = headers.get('authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or not hmac.compare_digest(token.strip().encode(), self.token.encode()):
+            raise ApiError(401, 'the token of the daemon is required as \'Authorization: Bearer <token>\'')
+
+    # answer a request, return (status, JSON-able body)
+    async def dispatch(self, method, target, body, headers=None):
+        path, _, query_string = target.partition('?')
+        query = {k: v[-1] for k, v in parse_qs(query_string).items()}
+        parts = [unquote(i) for i in path.strip('/').split('/')]
+        try:
+            self.authorize(headers or {})
+            if method == 'POST' and parts == ['login']:
+                try:
+                    login = json.loads(body.decode() or '{}')
+                    username = login['username']
+                    password = login['password']
+                except (ValueError, KeyError, TypeError):
+                    raise ApiError(400, 'the body must be like {"username": ..., "password": ...}')
+                if not password:
+                    raise ApiError(400, 'the password of %s is required' % username)
+                await self.log_in(username, password)
+                return 200, {'username': username, 'logged_in': True}
+            if method == 'GET' and parts == ['stats']:
+                return 200, self.stats()
+            if len(parts) == 3 and parts[0] == 'users' and parts[2] in self.resources:
+                if method != 'GET':
+                    raise ApiError(405, 'only GET is allowed')
+                return 200, await self.query(parts[1], parts[2], query)
+            raise ApiError(404, 'no such endpoint: %s %s' % (method, path))
+        except ApiError as e:
+            self.errors += 1
+            return e.status, {'error': str(e)}
+        except Exception as e:
+            self.errors += 1
+            return 502, {'error': str(e) or type(e).__name__}
+
+    # serve the requests of a connection, keeping it alive until the client closes it
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, target, version, headers, body = request
+                status, payload = await self.dispatch(method, target, body, headers)
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                data = json.dumps(payload, ensure_ascii=False).encode()
+                writer.write(('HTTP/1.1 %d %s\r\nContent-Type: application/json; charset=utf-8\r\n'
+                              'Content-Length: %d\r\nConnection: %s\r\n\r\n' % (
+                                  status, HTTPStatus(status).phrase, len(data),
+                                  'keep-alive' if keep_alive else 'close')).encode() + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        except asyncio.CancelledError:  # the daemon is stopping, end the connection quietly
+            pass
+        finally:
+            writer.close()
+
+    # listen on 'host:port' or on the path of a Unix socket, readable only by you, until cancelled
+    async def serve(self, address, on_ready=None):
+        if '/' in address:
+            if os.path.exists(address):
+                os.unlink(address)
+            server = await asyncio.start_unix_server(self.handle, address, backlog=BACKLOG)
+            os.chmod(address, 0o600)
+        else:
+            host, _, port = address.rpartition(':')
+            server = await asyncio.start_server(self.handle, host or '127.0.0.1', int(port), backlog=BACKLOG)
+        if on_ready:
+            on_ready(server)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        for account in self.accounts.values():
+            account.sess.close()
+
+
+# read a request, return (method, target, version, {lowercase header: value}, body), None at the end of the stream
+async def read_request(reader):
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    method, target, version = line.decode('latin-1').split()
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', 0))
+    if length > MAX_BODY:
+        raise ValueError('request body too large')
+    body = await reader.readexactly(length) if length else b''
+    return method, target, version, headers, body
@@ -0,0 +1,87 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : http_cache.py
+# @Project : NKU-EAMIS
+
+"""
+Memoization of GET responses within a run.
+
+Only the endpoints given a TTL are cached, since some EAMIS GETs change the server-side state (e.g. switching the
+project). Responses are keyed by the url and the cookies of the session, evicted in LRU order once their total
+size exceeds max_bytes, and all dropped after a POST that isn't known to be read-only.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+MAX_BYTES = 8 * 1024 * 1024
+
+
+class CachingSession(object):
+    def __init__(self, sess, ttls, readonly_posts=(), max_bytes=MAX_BYTES):
+        self.sess = sess
+        self.ttls = ttls  # url without query -> seconds
+        self.readonly_posts = set(readonly_posts)  # urls without query of the POSTs which change nothing
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # (url, cookies) -> (expires, response)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.saved_bytes = 0
+        self.lock = threading.Lock()
+
+    # everything else, e.g. cookies, headers and close(), is the wrapped session's
+    def __getattr__(self, name):
+        return getattr(self.sess, name)
+
+    def cookie_key(self):
+        return tuple(sorted((c.name, c.value) for c in self.sess.cookies))
+
+    def get(self, url, **kwargs):
+        ttl = self.ttls.get(url.split('?')[0])
+        if not ttl or kwargs:
+            return self.sess.get(url, **kwargs)
+        key = (url, self.cookie_key())
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] > now:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                self.saved_bytes += len(entry[1].content)
+                return entry[1]
+            self.misses += 1
+        response = self.sess.get(url)
+        if response.status_code == 200:
+            self.store(key, now + ttl, response)
+        return response
+
+    def post(self, url, **kwargs):
+        if url.split('?')[0] not in self.readonly_posts:
+            self.invalidate()
+        return self.sess.post(url, **kwargs)
+
+    def store(self, key, expires, response):
+        size = len(response.content)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old:
+                self.size -= len(old[1].content)
+            self.entries[key] = (expires, response)
+            self.size += size
+            while self.size > self.max_bytes:
+                evicted = self.entries.popitem(last=False)[1]
+                self.size -= len(evicted[1].content)
+
+    # drop the cached responses, all of them or those of the urls starting with prefix
+    def invalidate(self, prefix=None):
+        with self.lock:
+            for key in list(self.entries):
+                if prefix is None or key[0].startswith(prefix):
+                    self.size -= len(self.entries.pop(key)[1].content)
+
+    def stats(self):
+        return 'HTTP cache: %d hits, %d misses, %.1f KB saved' % (self.hits, self.misses, self.saved_bytes / 1024)
@@ -16,6 +16,14 @@ Usage:
     nkueamis -e [-u <username> -p <password>]
     nkueamis -e -s <semester> -u <username> -p <password>
     nkueamis --elect-course
+    nkueamis --search <keyword> [(-u <username> [-p <password>])] [--no-cache]
+    nkueamis --offline --search <keyword>
+    nkueamis [(-g <course_category>)] [-c] [-e] [(-s <semester>)] [(-u <username> [-p <password>])] [--to=<last_semester>] [--parallel] [--no-cache] [--format=<format>] [--profile] [--trace=<trace_file>]
+    nkueamis --sync [(-s <semester>)] [(-u <username> [-p <password>])] [--no-cache] [--profile] [--trace=<trace_file>]
+    nkueamis --offline [(-g <course_category>)] [-c] [-e] [(-s <semester>)] [(-u <username>)] [--format=<format>]
+    nkueamis --watch [(-g <course_category>)] [-e] [(-s <semester>)] [(-u <username> [-p <password>])] [--interval=<seconds>] [--hook=<command>] [--format=<format>]
+    nkueamis --batch <credentials_file> [(-g <course_category>)] [-c] [-e] [(-s <semester>)] [--workers=<n>] [--rate=<requests>] [--format=<format>] [--profile] [--trace=<trace_file>]
+    nkueamis --daemon [--listen=<address>] [--workers=<n>]
 
 A simple tool to help get information in NKU-EAMIS(NKU Education Affairs Management Information System).
 
@@ -24,6 +32,8 @@ Arguments:
     semester             the semester you want to query, must be in '[Year]-[Year]:[Semester]' type
     username             your username in NKU-EAMIS system
     password             your password in NKU-EAMIS system
+    keyword              words in the no, name, teachers or rooms of a course, a word beginning with '^' matches a prefix
+    credentials_file     a CSV file of 'username,password' lines, lines beginning with '#' are skipped
 
 Options:
     -g                   grade query
@@ -33,6 +43,23 @@ Options:
     -u                   username
     -p                   password
     --elect-course       elect course
+    --search             search the electable courses
+    --to=<last_semester>  get the course tables of every semester from -s <semester> to this one
+    --parallel           run the queries concurrently after logging in
+    --no-cache           don't reuse or save the logged-in session
+    --sync               save the std detail, grades, semesters, courses, exams and electable courses to the local store
+    --offline            answer the queries from the local store, without logging in
+    --watch              poll the grades and exams, printing only the new or changed ones
+    --interval=<seconds>  seconds between two polls of the watch mode, varied by 10% [default: 300]
+    --hook=<command>     run a shell command for every change found by the watch mode, with it as JSON on stdin
+    --format=<format>    print the tables, or stream the records as json, jsonl or csv [default: table]
+    --profile            print the time, bytes and redirects of every stage, and the GET cache hits, to stderr
+    --trace=<trace_file>  also write the stages to a Chrome trace-event JSON file
+    --batch              query every account of the credentials file, printing each as soon as it's done
+    --workers=<n>        accounts to query at the same time in the batch mode, fetches in the daemon mode [default: 8]
+    --rate=<requests>    requests per second to send at most in the batch mode [default: 10]
+    --daemon             serve the queries as a local JSON API, keeping the sessions logged in
+    --listen=<address>   host:port, or the path of a Unix socket, for the daemon to listen on [default: 127.0.0.1:8765]
     -h, --help           guidance
 
 Examples:
@@ -41,21 +68,44 @@ Examples:
     nkueamis -c
     nkueamis -c -s 2016-2017:2
     nkueamis -e -u your_username -p your_password
+    nkueamis -g ABCDE -c -e --parallel
+    nkueamis --search '高等数学 ^张'
+    nkueamis -c -e --profile --trace=trace.json
+    nkueamis -c -s 2014-2015:1 --to=2017-2018:2
+    nkueamis --sync -s 2016-2017:2
+    nkueamis --offline -g ABCDE -c -s 2016-2017:2
+    nkueamis --watch -g ABCDE -e --interval=600 --hook='cat >> changes.jsonl'
+    nkueamis --batch accounts.csv -g ABCDE -e --workers=16
+    nkueamis --batch accounts.csv -g ABCDE -c --format=jsonl > cohort.jsonl
+    nkueamis --daemon --listen=/tmp/nkueamis.sock
 
 """
 
+# requests (through .transport), bs4, prettytable and concurrent.futures are imported by the functions using them,
+# so that e.g. `nkueamis -h` starts without them and `-c`/`-e` never load bs4
 from docopt import docopt
 import re
 import os
-import requests
-from bs4 import BeautifulSoup
-import prettytable
+import sys
 import getpass
-import _pickle
 import time
+import html
 import random
-
-HOME_URL = 'http://eamis.nankai.edu.cn'
+import threading
+import csv
+import json
+from array import array
+from io import StringIO
+from . import session_cache
+from .conflict import UNIT_COUNT, ConflictIndex, week_mask
+from .catalog import Catalog, load_catalog, save_catalog, drop_catalog, hash_content
+from .http_cache import CachingSession
+from . import profiling
+from . import records
+from . import semesters
+from .profiling import profiled, stage
+
+HOME_URL = os.environ.get('NKUEAMIS_HOME_URL', 'http://eamis.nankai.edu.cn')
 LOGIN_URL = HOME_URL + '/eams/login.action'
 STD_DETAIL_BASIC_URL = HOME_URL + '/eams/stdDetail.action'
 STD_DETAIL_URL = HOME_URL + '/eams/stdDetail!innerIndex.action'
@@ -71,30 +121,88 @@ ELECT_PAGE_URL = HOME_URL + '/eams/stdElectCourse!defaultPage.action'
 ELECT_DATA_URL = HOME_URL + '/eams/stdElectCourse!data.action'
 ELECT_POST_URL = HOME_URL + '/eams/stdElectCourse!batchOperator.action'
 COURSE_CAT = ['校公共必修课', '院系公共必修课', '专业必修课', '专业选修课', '任选课']
-
-
-# test the network
-def test_net():
-    conn = requests.get(LOGIN_URL)
-    response_status = conn.status_code
-    if response_status == '200':
-        return False
-    else:
-        return True
+COURSE_CAT_PATTERN = re.compile('|'.join(COURSE_CAT))
+COURSE_TOKEN_PATTERN = re.compile('var teachers = \\[(?P<teachers>.*?)\\];'
+                                  '|new TaskActivity\\((?P<activity>.*?)\\);'
+                                  '|index\\s*=\\s*(?P<weekday>\\d+)\\*unitCount\\+(?P<unit>\\d+);')
+JS_STRING_PATTERN = re.compile('"((?:[^"\\\\]|\\\\.)*)"')
+TEACHER_NAME_PATTERN = re.compile('name:"(.*?)"')
+ELECT_ARRANGE_PATTERN = re.compile('\\{id:(?P<id>\\d+),no:\''
+                                   '|weekDay:(?P<weekday>\\d+),weekState:\'(?P<weeks>[01]*)\','
+                                   'startUnit:(?P<start>\\d+),endUnit:(?P<end>\\d+)')
+# seconds to reuse the GET responses within a run, the other GETs may change the server-side state
+# (e.g. ELECT_PAGE_URL opens the election state of the session, so it must always reach the server)
+GET_CACHE_TTL = {
+    STD_DETAIL_URL: 300,
+    GRADE_URL: 60,
+    EXAM_URL: 60,
+    ELECT_URL: 60,
+    ELECT_DATA_URL: 60,
+}
+READONLY_POST_URLS = (COURSETABLE_QUERY_URL, COURSETABLE_URL)
+DAEMON_TTL = {'std': 24 * 3600, 'grades': 300, 'courses': 3600, 'exams': 600, 'catalog': 60}  # seconds
+DAEMON_TOKEN_FILE = 'daemon.token'
+EXAM_NO_ARRANGE_PATTERN = re.compile('^exam.*noArrange$')
+loaded_catalogs = {}  # election profile id -> Catalog
+semester_index = None  # the SemesterIndex, loaded on first use
+semester_index_lock = threading.RLock()  # held to load or download the index, once for concurrent misses
+
+
+# an answer of NKU-EAMIS that a query can't go on with, the message is for the user
+class QueryError(Exception):
+    pass
 
 
 # login to the system
-def log_in(username, password):
+@profiled('login', 'stage')
+def log_in(username, password, sess=None):
     login_data = {
         'username': username,
         'password': password
     }
-    s = requests.session()
-    s.post(LOGIN_URL, data=login_data)
-    return s
+    if sess is None:
+        from .transport import Transport
+        sess = Transport()
+    sess.post(LOGIN_URL, data=login_data)
+    return sess
+
+
+# check cheaply whether a session is still logged in, the home page redirects to login when it's not
+def is_logged_in(sess):
+    resp = sess.get(HOME_URL + '/eams/home.action', allow_redirects=False, stream=True)
+    resp.close()
+    return resp.status_code == 200
+
+
+# log in with the session cached on disk while it's still alive, otherwise log in again and cache it
+# there's no separate probe of the network, the first request raises a RequestException when it's unreachable
+@profiled('session restore', 'stage')
+def cached_log_in(username, password=None):
+    from .transport import Transport
+    start = time.time()
+    sess = Transport()
+    if session_cache.load_cookies(username, sess.cookies) and is_logged_in(sess):
+        print('Session cache hit (%.3fs)' % (time.time() - start), file=sys.stderr)
+        return sess
+    sess.cookies.clear()
+    if password is None:
+        password = getpass.getpass('Input your password:')
+    sess = log_in(username, password, sess)
+    if is_logged_in(sess):
+        session_cache.save_cookies(username, sess.cookies)
+    else:
+        session_cache.drop_cookies(username)
+    print('Session cache miss (%.3fs)' % (time.time() - start), file=sys.stderr)
+    return sess
+
+
+# fork a logged-in session, so that cookies like semester.id set by one query don't leak into another
+def fork_session(sess):
+    return sess.fork()
 
 
 # find student's detail
+@profiled('parse std detail')
 def get_std_detail(content):
     pattern = re.compile(
         '姓名：</td>.*?<td>(.+?)</td>.*?院系：</td>.*?<td>(.+?)</td>.*?专业：</td>.*?<td>(.+?)</td>', re.S)
@@ -102,28 +210,21 @@ def get_std_detail(content):
     return detail
 
 
-# print detail of student on screen
-def print_std_detail(sess):
+# print the (name, department, major) of student on screen, or write it to a record writer
+def render_std_detail(std_detail, out=None, writer=None):
+    if writer:
+        writer.write_all(records.student_records(std_detail))
+    else:
+        print('\n姓名:%s\n院系:%s\n专业:%s\n' % (std_detail[0], std_detail[1], std_detail[2]), file=out)
+
+
+# print detail of student on screen, or write it to a record writer
+@profiled('std detail', 'stage')
+def print_std_detail(sess, out=None, writer=None):
     resp = sess.get(STD_DETAIL_URL + '?projectId=1')
     result = get_std_detail(resp.content.decode())
     if result:
-        std_detail = result[0]
-        print('\n姓名:%s\n院系:%s\n专业:%s\n' % (std_detail[0], std_detail[1], std_detail[2]))
-
-
-# find the category of course
-def find_course_cat(i, content):
-    pattern = re.compile(COURSE_CAT[i-1])
-    result = pattern.findall(content)
-    return result
-
-
-# convert str tuple into num tuple
-def tuple_conv(strtuple):
-    inttuple = []
-    for i in strtuple:
-        inttuple.append(int(i))
-    return tuple(inttuple)
+        render_std_detail(result[0], out, writer)
 
 
 # replace some irregular words
@@ -136,127 +237,223 @@ def replace_some_word(text):
 
 
 # find the information of semester
+@profiled('parse semesters')
 def get_semester_info(data):
     pattern = re.compile('{id:(.+?),schoolYear:"(.+?)",name:"(.+?)"}', re.S)
     result = pattern.findall(data)
     return result
 
 
-# determine the semester_id based on the <semester> arg
+# get the semester index cached on disk
+def get_semester_index():
+    global semester_index
+    with semester_index_lock:
+        if semester_index is None:
+            semester_index = semesters.load_index()
+    return semester_index
+
+
+# download the semester calendar into the index
+def refresh_semester_index(sess):
+    with semester_index_lock:
+        index = get_semester_index()
+        semester_data = {'dataType': 'semesterCalendar'}
+        resp = sess.post(COURSETABLE_QUERY_URL, data=semester_data)
+        semester_info = get_semester_info(resp.content.decode())
+        index.update(semester_info)
+        index.fetched = time.time()
+        semesters.save_index(index)
+    return semester_info
+
+
+# remember the current semester id set in a semester.id cookie
+def remember_current_semester(semester_id):
+    index = get_semester_index()
+    if index.set_current(semester_id):
+        semesters.save_index(index)
+
+
+# get the current semester id, from the index if it was seen lately, otherwise from the cookie of the exam page
+def get_current_semester_id(sess, out=None):
+    semester_id = get_semester_index().current_id()
+    if semester_id:
+        return semester_id
+    response = sess.get(EXAM_ID_URL)
+    try:
+        semester_id = re.findall('semester\\.id=(.+?);', response.headers['Set-Cookie'])[0]
+    except KeyError:
+        print('Failed to get your exams, please check your username and password!', file=out)
+        return None
+    remember_current_semester(semester_id)
+    return semester_id
+
+
+# determine the semester_id based on the <semester> arg, downloading the calendar only when it's not in the index
+# concurrent misses, e.g. of the batch mode, wait for one download instead of each downloading it
+@profiled('semester resolve', 'stage')
 def determine_semester_id(sess, semester):
-    semester = semester.split(':')
-    semester_data = {'dataType': 'semesterCalendar'}
-    resp = sess.post(COURSETABLE_QUERY_URL, data=semester_data)
-    semester_info = get_semester_info(resp.content.decode())
-    for i in semester_info:
-        if list(i)[1:] == semester:
-            semester_id = i[0]
-            return semester_id
-    print('Failed to find your semester, please make sure that you\'ve correctly inputed!')
-    exit()
-
-
-# get information of grades
-def get_grade_info(i, table):
-    result = []
-    for info in table:
-        if len(info('td')) == 8:
-            result.append([replace_some_word(info('td')[2].text), info('td')[3].text, info('td')[5].text])
-        if find_course_cat(i, info.text):
-            result = []
-        if i < 5 and find_course_cat(i+1, info.text):
-            return result
-    return result
+    semester_id = get_semester_index().id_of(semester)
+    if semester_id is None:
+        with semester_index_lock:
+            semester_id = get_semester_index().id_of(semester)
+            if semester_id is None:
+                refresh_semester_index(sess)
+                semester_id = get_semester_index().id_of(semester)
+    if semester_id is None:
+        raise QueryError('Failed to find your semester, please make sure that you\'ve correctly inputed!')
+    return semester_id
+
+
+# grades of all the categories, parsed from the grade page in a single pass, or added row by row
+class GradeBook(object):
+    def __init__(self, content=''):
+        self.rows = {i: [] for i in range(1, len(COURSE_CAT) + 1)}  # category -> [[name, credit, score]]
+        self.credits = dict.fromkeys(self.rows, 0.0)  # category -> credits with a score
+        self.weighted = dict.fromkeys(self.rows, 0.0)  # category -> sum of credit*score
+        if not content:
+            return
+        cat = None
+        with stage('parse grades', 'parse'):
+            from bs4 import BeautifulSoup
+            for info in BeautifulSoup(content, 'html.parser')('tr'):
+                td = info('td')
+                cat_name = COURSE_CAT_PATTERN.search(info.text)
+                if cat_name:
+                    cat = COURSE_CAT.index(cat_name.group()) + 1
+                elif cat and len(td) == 8:
+                    self.add_row(cat, [replace_some_word(td[2].text), td[3].text, td[5].text])
+
+    # add a [name, credit, score] row to a category
+    def add_row(self, cat, row):
+        self.rows[cat].append(row)
+        self.add_total(cat, row)
+
+    # add a row to the credit and weighted sums of its category, skip the rows without a valid score
+    def add_total(self, cat, row):
+        try:
+            if row[2] and row[2] != '--':
+                credit = float(row[1])
+                self.weighted[cat] += credit*float(row[2].split(' ')[0])
+                self.credits[cat] += credit
+        except ValueError:
+            pass
+
+    # get the rows of the specified categories, e.g. 'BCD'
+    def select(self, cat_list_str):
+        return [self.rows[ord(i)-64] for i in cat_list_str]
+
+    # calculate the avg and sum of grade of the specified categories
+    def summary(self, cat_list_str):
+        cats = [ord(i)-64 for i in cat_list_str]
+        scoresum = sum(self.credits[i] for i in cats)
+        gradesum = sum(self.weighted[i] for i in cats)
+        if scoresum:
+            return gradesum/scoresum, scoresum
+        return 0, scoresum
 
 
 # get grade information of specified courses
 def get_specified_grade(resp, cat_list_str):
-    result = []
-    cat_list_num = [ord(i)-65 for i in cat_list_str]
-    soup = BeautifulSoup(resp.content.decode(), 'html.parser')
-    for i in cat_list_num:
-        result.append(get_grade_info(i+1, soup('tr')))
-    return result
-
-
-# calculate the avg and sum of grade
-def grade_calc(table):
-    gradesum = 0
-    scoresum = 0
-    for cat in table:
-        for i in cat:
-            try:
-                if i[2] and i[2] != '--':
-                    gradesum += float(i[1])*float(i[2].split(' ')[0])
-                    scoresum += float(i[1])
-            except ValueError:
-                continue
-    if scoresum:
-        avg = gradesum/scoresum
-    else:
-        avg = 0
-    return avg, scoresum
+    return GradeBook(resp.content.decode()).select(cat_list_str)
 
 
 # get the necessary id to post data for course table
 def get_std_course_id(resp):
     std_id_pattern = \
-        re.compile('bg\.form\.addInput\(form,"ids","(.+?)"\);')
+        re.compile('bg\\.form\\.addInput\\(form,"ids","(.+?)"\\);')
     std_id = std_id_pattern.findall(resp.content.decode())
     return std_id
 
 
-# get information of courses
-def get_course_info(resp):
-    teacher_pattern = re.compile('var teachers = \[{id:.*?,name:"(.+?)",lab:.*?}\];')
-    course_info_pattern = re.compile('\)","(.+?)\(.+?\)",".*?","(.*?)","0*1*0*"')
-    course_time_pattern = re.compile('=(.+?)\*unitCount\+(.+?);')
-    teacher_name = teacher_pattern.findall(resp.content.decode())
-    course_info_iter = course_info_pattern.finditer(resp.content.decode())
-    # test = course_info_pattern.findall(resp.content.decode())
-    course_info = course_info_pattern.findall(resp.content.decode())
-    course_pos = [i.start() for i in course_info_iter]
-    course_info = [list(i) for i in course_info]
-    course = []
-    i = 0
-    if course_pos:
-        for i in range(len(course_pos) - 1):
-            course.append([tuple_conv(i) for i in course_time_pattern.findall(resp.content.decode(),
-                                                                              course_pos[i], course_pos[i+1])])
-        course.append([tuple_conv(i) for i in course_time_pattern.findall(resp.content.decode(), course_pos[i+1])])
+# a course activity of the course table, with the (weekday, unit) pairs flattened into an array
+class CourseActivity(object):
+    __slots__ = ('name', 'room', 'teacher', 'weeks', 'times')
+
+    def __init__(self, name, room, teacher, weeks):
+        self.name = name
+        self.room = room
+        self.teacher = teacher
+        self.weeks = weeks  # e.g. '01111111111111111000', the n-th char for the n-th week
+        self.times = array('B')
+
+    # iterate over the (weekday, unit) pairs of the activity
+    def iter_times(self):
+        it = iter(self.times)
+        return zip(it, it)
+
+
+# parse the TaskActivity script of the course table in a single scan
+@profiled('parse course table')
+def parse_course_table(content):
     result = []
-    for i in range(len(course_info)):
-        result.append(course_info[i] + [teacher_name[i]] + course[i])
+    teacher = ''
+    activity = None
+    for token in COURSE_TOKEN_PATTERN.finditer(content):
+        if token.group('teachers') is not None:
+            teacher = ','.join(TEACHER_NAME_PATTERN.findall(token.group('teachers')))
+        elif token.group('activity') is not None:
+            args = JS_STRING_PATTERN.findall(token.group('activity'))
+            if len(args) < 5:
+                activity = None
+                continue
+            name = args[1]
+            if name.endswith(')') and '(' in name:
+                name = name[:name.rindex('(')]
+            activity = CourseActivity(name, args[3], teacher, args[4])
+            result.append(activity)
+        elif activity:
+            activity.times.extend((int(token.group('weekday')), int(token.group('unit'))))
     return result
 
 
-# print the grade table on screen
-def print_grade_table(resp, cat_list_str):
+# get information of courses
+def get_course_info(resp):
+    return parse_course_table(resp.content.decode())
+
+
+# print the grade table on screen, or write the grades to a record writer
+@profiled('grades', 'stage')
+def print_grade_table(resp, cat_list_str, out=None, writer=None):
+    render_grade_book(GradeBook(resp.content.decode()), cat_list_str, out, writer)
+
+
+# get the categories like 'BCD' sorted and without anything else
+def normalize_cat_list(cat_list_str):
     cat_list_str_list = [i for i in cat_list_str.upper() if ord(i) in range(65, 70)]
     cat_list_str_list = list(set(cat_list_str_list))
     cat_list_str_list.sort()
-    cat_list_str = ''.join(cat_list_str_list)
+    return ''.join(cat_list_str_list)
+
+
+# print the grades of the categories on screen, or write them to a record writer
+def render_grade_book(grade_book, cat_list_str, out=None, writer=None):
+    cat_list_str = normalize_cat_list(cat_list_str)
     n = 1
-    table = prettytable.PrettyTable(['', '课程名称', '学分', '成绩'])
-    grade_table = get_specified_grade(resp, cat_list_str)
+    grade_table = grade_book.select(cat_list_str)
     flag = False
     for i in grade_table:
         if i:
             flag = True
             break
-    if flag:
-        for cat in grade_table:
-            for i in cat:
-                table.add_row([str(n)] + i)
-                n += 1
-        table.align['成绩'] = 'l'
-        print('\n%s类成绩表:' % cat_list_str)
-        print(table)
-        output_grade = grade_calc(get_specified_grade(resp, cat_list_str))
-        print('%s类已修学分:%.1f' % (cat_list_str, output_grade[1]))
-        print('%s类学分绩:%.4f\n' % (cat_list_str, output_grade[0]))
+    if flag and writer:
+        writer.write_all(records.grade_records(grade_book, cat_list_str))
+    elif flag:
+        with stage('render grades', 'render'):
+            import prettytable
+            table = prettytable.PrettyTable(['', '课程名称', '学分', '成绩'])
+            for cat in grade_table:
+                for i in cat:
+                    table.add_row([str(n)] + i)
+                    n += 1
+            table.align['成绩'] = 'l'
+            print('\n%s类成绩表:' % cat_list_str, file=out)
+            print(table, file=out)
+            output_grade = grade_book.summary(cat_list_str)
+            print('%s类已修学分:%.1f' % (cat_list_str, output_grade[1]), file=out)
+            print('%s类学分绩:%.4f\n' % (cat_list_str, output_grade[0]), file=out)
     else:
-        print('Failed to get your grades, please check your username and password!')
+        print('Failed to get your grades, please check your username and password!',
+              file=sys.stderr if writer else out)
 
 
 # struct course data to help make course table
@@ -264,191 +461,503 @@ def struct_course_data(sess, project_id, semester_id=None):
     project_id = str(project_id)
     sess.get(COURSETABLE_CLASS_URL + '?projectId=%s' % project_id)
     response = sess.get(COURSETABLE_ID_URL + '?projectId=%s' % project_id)
+    current_id = re.findall('semester\\.id=(.+?);', response.headers.get('Set-Cookie', ''))
+    if current_id:
+        remember_current_semester(current_id[0])
     if not semester_id:
-        try:
-            semester_id = re.findall('semester\.id=(.+?);', response.headers['Set-Cookie'])[0]
-        except KeyError:
-            print('Failed to get your courses, please check your username and password!')
-            exit()
+        if not current_id:
+            raise QueryError('Failed to get your courses, please check your username and password!')
+        semester_id = current_id[0]
     result = get_std_course_id(response)
     if not result:
-        print('Sorry, something went wrong, please close and try again!')
-    else:
-        course_ids = result[0]
-        course_data = {
-            'setting.kind': 'std',
-            'semester.id': semester_id,
-            'ids': course_ids
-        }
-        return course_data
+        raise QueryError('Sorry, something went wrong, please close and try again!')
+    course_ids = result[0]
+    course_data = {
+        'setting.kind': 'std',
+        'semester.id': semester_id,
+        'ids': course_ids
+    }
+    return course_data
 
 
 # struct the course table, be ready for printing
+@profiled('render course table', 'render')
 def struct_course_table(course_info):
-    row = []
-    n = 1
-    table = prettytable.PrettyTable([''] + [str(i+1) for i in range(7)], hrules=prettytable.ALL)
-    mat = [['' for i in range(7)] for j in range(14)]
+    import prettytable
+    cells = {}
     for i in course_info:
-        for j in i[3:]:
-            mat[j[1]][j[0]] = i[:3]
-    for i in mat:
-        row.append(str(n))
-        for j in i:
-            if j:
-                row.append('%s\n%s@%s' % (replace_some_word(j[0]), j[2], j[1]))
-            else:
-                row.append(j)
-        table.add_row(row)
-        row = []
-        n += 1
+        for weekday, unit in i.iter_times():
+            cells[unit, weekday] = '%s\n%s@%s' % (replace_some_word(i.name), i.teacher, i.room)
+    table = prettytable.PrettyTable([''] + [str(i+1) for i in range(7)], hrules=prettytable.ALL)
+    for unit in range(UNIT_COUNT):
+        table.add_row([str(unit+1)] + [cells.get((unit, weekday), '') for weekday in range(7)])
     return table
 
 
-# print the course table on screen
-def print_course_table(sess, semester_id=None):
+# switch the server-side session back to project 1, which every other page is of, after the pages of project 2
+def restore_project(sess):
+    sess.get(HOME_URL + '/eams/home.action')
+    sess.get(COURSETABLE_CLASS_URL + '?projectId=1')
+
+
+# get the course activities of both projects
+# project 2 switches the project of the whole server-side session until it's restored, so a concurrent
+# caller can pass an event (or anything with a wait()) to hold that switch until the other queries are done
+def fetch_course_info(sess, semester_id=None, switch_ready=None):
     course_data1 = struct_course_data(sess, '1', semester_id)
     courses1 = get_course_info(sess.post(COURSETABLE_URL, data=course_data1))
+    if switch_ready:
+        switch_ready.wait()
     sess.get(HOME_URL + '/eams/home.action')
-    course_data2 = struct_course_data(sess, '2', semester_id)
-    courses2 = get_course_info(sess.post(COURSETABLE_URL, data=course_data2))
-    courses = struct_course_table(courses1 + courses2)
-    print('课程表:')
-    print(courses)
-
-
-# get the exam id
-def get_exam_id(sess, semester_id):
-    headers = {'Cookie': 'JSESSIONID=%s; semester.id=%s' % (sess.cookies.items()[0][1], semester_id)}
-    response = requests.get(EXAM_ID_URL, headers=headers)
-    pattern = re.compile('\'/eams/stdExam!examTable\.action\?examBatch\.id=(.+?)\'')
+    try:
+        course_data2 = struct_course_data(sess, '2', semester_id)
+        courses2 = get_course_info(sess.post(COURSETABLE_URL, data=course_data2))
+    finally:
+        restore_project(sess)
+    return courses1 + courses2
+
+
+# get the course activities of both projects for many semesters, as {semester id: activities}
+# the ids posted for a project are the same for every semester, so each project is switched to once and its
+# semesters are posted concurrently; project 2 only after all of project 1, as it switches the server-side session
+# until it's restored
+# the semesters before the current one are cached in the local store when the username is given
+def fetch_timetables(sess, semester_ids, switch_ready=None, username=None):
+    from concurrent.futures import ThreadPoolExecutor
+    index = get_semester_index()
+    timetables = dict.fromkeys(semester_ids)
+    store = None
+    if username:
+        from .store import Store
+        store = Store()
+        for semester_id in semester_ids:
+            rows = store.get_rows('courses', (username, semester_id)) if index.finished(semester_id) else None
+            if rows is not None:
+                timetables[semester_id] = activities_from_rows(rows)
+    todo = [i for i in semester_ids if timetables[i] is None]
+
+    def post(course_data):
+        s = fork_session(sess)
+        try:
+            return get_course_info(s.post(COURSETABLE_URL, data=course_data))
+        finally:
+            s.close()
+
+    if todo:
+        switched = False
+        with ThreadPoolExecutor(max_workers=min(len(todo), 8)) as executor:
+            try:
+                for project_id in ('1', '2'):
+                    if project_id == '2':
+                        if switch_ready:
+                            switch_ready.wait()
+                        sess.get(HOME_URL + '/eams/home.action')
+                        switched = True
+                    course_data = struct_course_data(sess, project_id, todo[0])
+                    course_data_list = [dict(course_data, **{'semester.id': i}) for i in todo]
+                    for semester_id, courses in zip(todo, executor.map(post, course_data_list)):
+                        timetables[semester_id] = (timetables[semester_id] or []) + courses
+            finally:
+                if switched:
+                    restore_project(sess)
+    if store:
+        for semester_id in todo:
+            if index.finished(semester_id):
+                store.put_rows('courses', (username, semester_id), activity_rows(timetables[semester_id]))
+        store.close()
+    return timetables
+
+
+# convert course activities to the rows of the local store and back
+def activity_rows(course_info):
+    return [(i.name, i.room, i.teacher, i.weeks, i.times.tobytes()) for i in course_info]
+
+
+def activities_from_rows(rows):
+    course_info = []
+    for name, room, teacher, weeks, times in rows:
+        course_info.append(CourseActivity(name, room, teacher, weeks))
+        course_info[-1].times.frombytes(times)
+    return course_info
+
+
+# print the course tables of the semesters from first to last, or write the activities with their semester
+@profiled('course tables', 'stage')
+def print_course_tables(sess, first, last, out=None, switch_ready=None, writer=None, username=None):
+    semester_ids = get_semester_index().between(determine_semester_id(sess, first), determine_semester_id(sess, last))
+    for semester_id, course_info in fetch_timetables(sess, semester_ids, switch_ready, username).items():
+        semester = get_semester_index().name_of(semester_id)
+        if writer:
+            render_course_table(course_info, writer=writer.bind(semester=semester))
+        else:
+            print('\n%s学期' % semester, file=out)
+            render_course_table(course_info, out)
+
+
+# print the course table on screen, or write the activities to a record writer
+@profiled('course table', 'stage')
+def print_course_table(sess, semester_id=None, out=None, switch_ready=None, writer=None):
+    render_course_table(fetch_course_info(sess, semester_id, switch_ready), out, writer)
+
+
+# print the course activities as a table on screen, or write them to a record writer
+def render_course_table(course_info, out=None, writer=None):
+    if writer:
+        writer.write_all(records.course_records(course_info))
+        return
+    courses = struct_course_table(course_info)
+    print('课程表:', file=out)
+    print(courses, file=out)
+
+
+# get the exam id, None when there aren't any exams
+# the semester.id cookie of the session would be sent before the one of the request, so it's dropped first
+def get_exam_id(sess, semester_id, out=None):
+    for cookie in [i for i in sess.cookies if i.name == 'semester.id']:
+        sess.cookies.clear(cookie.domain, cookie.path, cookie.name)
+    response = sess.get(EXAM_ID_URL, cookies={'semester.id': semester_id})
+    pattern = re.compile('\'/eams/stdExam!examTable\\.action\\?examBatch\\.id=(.+?)\'')
     exam_id = pattern.findall(response.content.decode())
     if exam_id:
         return exam_id[0]
     else:
         print('Sorry, there are not any exam arrangement now '
-              '(or for the semester you just typed in).\nYou may try another semester.\n')
-        exit()
+              '(or for the semester you just typed in).\nYou may try another semester.\n', file=out)
+
+
+# an exam of the exam table
+class ExamRecord(object):
+    __slots__ = ('name', 'date', 'time', 'location')
+
+    def __init__(self, name, date, time, location):
+        self.name = name
+        self.date = date
+        self.time = time
+        self.location = location
+
+
+# get the text of a html fragment, in linear time even for broken tags
+def strip_tags(fragment):
+    parts = fragment.split('<')
+    text = [parts[0]]
+    for part in parts[1:]:
+        i = part.find('>')
+        text.append(part[i+1:] if i >= 0 else '<' + part)
+    return html.unescape(''.join(text)).strip()
+
+
+# get the texts of the cells of every row, splitting the page by tags instead of backtracking regexes
+def iter_table_rows(content):
+    for row in content.split('<tr')[1:]:
+        end = row.find('</tr>')
+        if end >= 0:
+            row = row[:end]
+        cells = []
+        for cell in row.split('<td')[1:]:
+            start = cell.find('>')
+            end = cell.find('</td>')
+            if end < 0:
+                end = len(cell)
+            cells.append(strip_tags(cell[start+1:end]) if 0 <= start < end else '')
+        yield cells
+
+
+# parse the exams in normal status: rows of course no, name, type, date, time, location, ..., status
+@profiled('parse exams')
+def parse_exam_table(content):
+    result = []
+    for cells in iter_table_rows(content):
+        if len(cells) < 7 or len(cells[0]) != 4 or not cells[0].isdigit() or '正常' not in cells[6:]:
+            continue
+        date, exam_time, location = ['' if EXAM_NO_ARRANGE_PATTERN.match(i) else i for i in cells[3:6]]
+        result.append(ExamRecord(cells[1], date, exam_time, location))
+    return result
 
 
-# print the exam table on screen
-def print_exam_table(sess, semester_id=None):
+# get the exam id of the semester, or of the current one, None when there aren't any exams
+def get_exam_batch_id(sess, semester_id=None, out=None):
     if not semester_id:
-        response = sess.get(EXAM_ID_URL)
-        try:
-            semester_id =re.findall('semester\.id=(.+?);', response.headers['Set-Cookie'])[0]
-        except KeyError:
-            print('Failed to get your exams, please check your username and password!')
-    response = sess.get(EXAM_URL + '?examBatch.id=%s' % get_exam_id(sess, semester_id))
-    text = response.content.decode()
-    text = re.sub('<font color="BBC4C3">exam.*?noArrange</font>', '><', text)
-    pattern = re.compile('<td>\d{4}</td><td>(.*?)</td><td>.*?</td>.*?<td>>*'
-                         '(.*?)<*</td>.*?<td>>*(.*?)<*</td>.*?<td>.*?>(.*?)<.*?</td>.*?<td>正常</td>', re.S)
-    exam_info = pattern.findall(text)
-    table = prettytable.PrettyTable(['', '课程名称', '考试日期', '考试时间', '考试地点'])
-    n = 1
-    for row in exam_info:
-        row = list(row)
-        row[0] = replace_some_word(row[0])
-        table.add_row([str(n)] + list(row))
-        n += 1
-    print('考试安排:')
-    print(table)
+        semester_id = get_current_semester_id(sess, out)
+    return get_exam_id(sess, semester_id, out)
 
 
-# get elect url-id to open elect page
-def get_elect_urlid(sess):
-    response = sess.get(ELECT_URL + '?projectId=1')
-    pattern = re.compile('/eams/stdElectCourse!defaultPage\.action\?electionProfile\.id=(\d+)')
-    url_ids = pattern.findall(response.content.decode())
-    if url_ids:
-        return url_ids
-    else:
-        print('Failed to find the url to elect course, please check that if the system is open!')
-        exit()
+# get the exams of the semester, or of the current one, None when there aren't any
+def fetch_exams(sess, semester_id=None, out=None):
+    exam_id = get_exam_batch_id(sess, semester_id, out)
+    if exam_id is None:
+        return None
+    response = sess.get(EXAM_URL + '?examBatch.id=%s' % exam_id)
+    return parse_exam_table(response.content.decode())
+
+
+# print the exam table on screen, or write the exams to a record writer
+@profiled('exams', 'stage')
+def print_exam_table(sess, semester_id=None, out=None, writer=None):
+    exams = fetch_exams(sess, semester_id, sys.stderr if writer else out)
+    if exams is not None:
+        render_exam_table(exams, out, writer)
 
 
-# get the semester-id for electing course
-def get_elect_semester_id(sess):
-    response = sess.get(ELECT_PAGE_URL + '?electionProfile.id=%s' % get_elect_urlid(sess)[0])
-    pattern = re.compile('&semesterId=(\d+)')
-    elect_semester_id = pattern.findall(response.content.decode())
-    return elect_semester_id[0]
+# print the exams as a table on screen, or write them to a record writer
+def render_exam_table(exams, out=None, writer=None):
+    if writer:
+        writer.write_all(records.exam_records(exams))
+        return
+    with stage('render exams', 'render'):
+        import prettytable
+        table = prettytable.PrettyTable(['', '课程名称', '考试日期', '考试时间', '考试地点'])
+        n = 1
+        for i in exams:
+            table.add_row([str(n), replace_some_word(i.name), i.date, i.time, i.location])
+            n += 1
+        print('考试安排:', file=out)
+        print(table, file=out)
 
 
-# get the id of elected course
-def get_elected_course_id(sess):
-    response = sess.get(ELECT_PAGE_URL + '?electionProfile.id=%s' % get_elect_urlid(sess)[0])
-    pattern = re.compile('electedIds\["l(\d+)"\] = true;')
-    elected = pattern.findall(response.content.decode())
-    return elected
+# find the election profile ids in the elect index page, empty when the election isn't open
+def find_elect_urlids(content):
+    pattern = re.compile('/eams/stdElectCourse!defaultPage\\.action\\?electionProfile\\.id=(\\d+)')
+    return pattern.findall(content)
 
 
-# tool for converting no to id
-def course_no2id(sess, course_no):
-    data = get_course_data(sess)
-    for i in data:
-        if i[1] == course_no:
-            course_id = i[0]
-            return course_id
+# get elect url-id to open elect page
+def get_elect_urlid(sess):
+    response = sess.get(ELECT_URL + '?projectId=1')
+    url_ids = find_elect_urlids(response.content.decode())
+    if url_ids:
+        return url_ids
+    else:
+        raise QueryError('Failed to find the url to elect course, please check that if the system is open!')
+
+
+# find the semester-id for electing course in the elect page
+def get_elect_page_semester_id(content):
+    pattern = re.compile('&semesterId=(\\d+)')
+    elect_semester_id = pattern.findall(content)
+    return elect_semester_id[0] if elect_semester_id else None
+
+
+# find the id of elected course in the elect page
+def get_elect_page_elected(content):
+    pattern = re.compile('electedIds\\["l(\\d+)"\\] = true;')
+    return pattern.findall(content)
+
+
+# find the result message of each operation in the response of batchOperator, keyed by course no
+@profiled('parse elect result')
+def get_elect_result(content):
+    pattern = re.compile('([^<>]*?\\[(\\d+)\\][^<>]*?)</br>')
+    return dict((no, message.strip()) for message, no in pattern.findall(content))
+
+
+# election state of a session, resolved once and then only again when the server says it's stale
+class ElectClient(object):
+    def __init__(self, sess):
+        self.sess = sess
+        self.profile_id = None
+        self.semester_id = None
+        self.elected = None  # set of elected course ids
+        self.conflicts = None  # the ConflictIndex of the timetable, built on use and dropped when the timetable changes
+
+    # open the elect page, and find the profile id, semester id and elected courses
+    def resolve(self):
+        self.profile_id = get_elect_urlid(self.sess)[0]
+        response = self.sess.get(ELECT_PAGE_URL + '?electionProfile.id=%s' % self.profile_id)
+        content = response.content.decode()
+        self.semester_id = get_elect_page_semester_id(content)
+        self.elected = set(get_elect_page_elected(content))
+
+    def ensure_resolved(self):
+        if self.profile_id is None:
+            self.resolve()
+
+    # get the catalog of the election profile
+    def catalog(self):
+        self.ensure_resolved()
+        return get_catalog(self.sess, self.profile_id)
+
+    # get the conflict index between the timetable and the catalog
+    def conflict_index(self):
+        if self.conflicts is None:
+            self.conflicts = build_conflict_index(self)
+        return self.conflicts
+
+    # forget the catalog, in memory and on disk, so that it's downloaded again on next use
+    def invalidate_catalog(self):
+        self.ensure_resolved()
+        loaded_catalogs.pop(self.profile_id, None)
+        drop_catalog(self.profile_id)
+        if isinstance(self.sess, CachingSession):
+            self.sess.invalidate(ELECT_DATA_URL)
+
+    # post the operations in one batch, operations are (course_id, 'true' to elect / 'false' to drop)
+    # return course_id -> result message, None for the courses without any message
+    def operate(self, operations):
+        self.ensure_resolved()
+        data = dict(('operator%d' % n, '%s:%s' % i) for n, i in enumerate(operations))
+        response = self.sess.post(ELECT_POST_URL + '?profileId=%s' % self.profile_id, data=data)
+        messages = get_elect_result(response.content.decode())
+        if response.status_code != 200 or not messages:
+            # the elect page isn't open any more, e.g. the session was reset, open it again and retry once
+            self.resolve()
+            response = self.sess.post(ELECT_POST_URL + '?profileId=%s' % self.profile_id, data=data)
+            messages = get_elect_result(response.content.decode())
+        by_id = self.catalog().by_id
+        result = {}
+        for course_id, course_status in operations:
+            message = messages.get(by_id[course_id][1]) if course_id in by_id else None
+            if message and '成功' in message:
+                if course_status == 'true':
+                    self.elected.add(course_id)
+                else:
+                    self.elected.discard(course_id)
+                self.conflicts = None
+            result[course_id] = message
+        return result
+
+
+# tool for converting no to id, downloading the catalog again once when the cached one doesn't have the course
+def course_no2id(client, course_no):
+    course = client.catalog().by_no.get(course_no)
+    if not course:
+        client.invalidate_catalog()
+        course = client.catalog().by_no.get(course_no)
+    if course:
+        return course[0]
     print('Failed to elect your course, please make sure you\'re able to elect this course!')
     exit()
 
 
 # print the elected courses
-def show_elected_courses(sess):
-    data = get_course_data(sess)
+def show_elected_courses(client):
+    by_id = client.catalog().by_id
     print('\n当前已选课程:\n')
-    for i in get_elected_course_id(sess):
-        for j in data:
-            if j[0] == i:
-                print(j[1], j[2])
+    for i in sorted(client.elected):
+        if i in by_id:
+            print(by_id[i][1], by_id[i][2])
+
+
+# get the (weekday, unit, week mask) triples of every electable course from its arrangeInfo
+@profiled('parse catalog arrangements')
+def get_course_arrange(content):
+    result = {}
+    triples = None
+    for token in ELECT_ARRANGE_PATTERN.finditer(content):
+        if token.group('id'):
+            triples = result.setdefault(token.group('id'), [])
+        elif triples is not None:
+            mask = week_mask(token.group('weeks'))
+            for unit in range(int(token.group('start')), int(token.group('end')) + 1):
+                triples.append((int(token.group('weekday')) - 1, unit - 1, mask))
+    return result
+
+
+# get information of electable courses
+@profiled('parse catalog')
+def parse_course_data(content):
+    pattern = re.compile('id:(\\d+),no:\'(\\d+)\',name:\'(.*?)\',.*?teachers:\'(.*?)\'.*?rooms:\'(.*?)\'', re.S)
+    return pattern.findall(content)
+
+
+# get the catalog of electable courses, from memory, from the cache on disk or from the server
+# the elect page must have been opened when the profile id is given
+def get_catalog(sess, profile_id=None):
+    page_opened = profile_id is not None
+    if not page_opened:
+        profile_id = get_elect_urlid(sess)[0]
+    catalog = loaded_catalogs.get(profile_id) or load_catalog(profile_id)
+    if catalog is None or catalog.expired():
+        if not page_opened:
+            sess.get(ELECT_PAGE_URL + '?electionProfile.id=%s' % profile_id)
+        response = sess.get(ELECT_DATA_URL + '?profileId=%s' % profile_id)
+        content = response.content.decode()
+        content_hash = hash_content(content)
+        if catalog is None or catalog.content_hash != content_hash:
+            catalog = Catalog(parse_course_data(content), get_course_arrange(content), content_hash)
+        catalog.fetched = time.time()
+        save_catalog(profile_id, catalog)
+    loaded_catalogs[profile_id] = catalog
+    return catalog
 
 
 # get information of electable courses
 def get_course_data(sess):
-    if os.path.exists('elect_data'):
-        with open('elect_data', 'rb') as f:
-            data = _pickle.load(f)
-    else:
-        url_ids = get_elect_urlid(sess)
-        sess.get(ELECT_PAGE_URL + '?electionProfile.id=%s' % url_ids[0])
-        response = sess.get(ELECT_DATA_URL + '?profileId=%s' % url_ids[0])
-        pattern = re.compile('id:(\d+),no:\'(\d+)\',name:\'(.*?)\',.*?teachers:\'(.*?)\'.*?rooms:\'(.*?)\'', re.S)
-        data = pattern.findall(response.content.decode())
-        with open('elect_data', 'wb') as f:
-            _pickle.dump(data, f)
-    return data
-
-
-# post data to elect course
-def elect_course(sess, course_id, course_status):
-    sess.get(ELECT_URL + '?projectId=1')
-    sess.get(ELECT_PAGE_URL + '?electionProfile.id=121')
-    data = {'operator0': '%s:%s' % (course_id, course_status)}
-    url_ids = get_elect_urlid(sess)
-    response = sess.post(ELECT_POST_URL + '?profileId=%s' % url_ids[0], data=data)
-    pattern = re.compile('<div.*?>(.+?\[\d+\].+?)</br>.*?</div>', re.S)
-    result = pattern.findall(response.content.decode())
-    if result:
-        print(result[0].strip())
-        if re.findall('成功|已经选过|冲突', result[0].strip()):
-            result.append('1')
-    else:
-        print('本次操作失败，请务必确保是正确操作(如不要退选不存在的课程等)！')
-        result.append('0')
+    return get_catalog(sess).courses
+
+
+# print the electable courses matching the keywords
+@profiled('search', 'stage')
+def print_search_result(sess, keyword):
+    render_search_result(get_catalog(sess), keyword)
+
+
+# print the courses of a catalog matching the keywords
+def render_search_result(catalog, keyword):
+    import prettytable
+    courses = catalog.search_index().search(keyword)
+    table = prettytable.PrettyTable(['', '选课序号', '课程名称', '教师', '教室'])
+    n = 1
+    for i in courses:
+        table.add_row([str(n), i[1], replace_some_word(i[2]), i[3], i[4]])
+        n += 1
+    print('搜索结果:')
+    print(table)
+
+
+# build the conflict index between the timetable of the electing semester and the electable courses
+# fetching the timetable switches the server-side session to project 2, so the elect page is opened again
+# afterwards to leave the session as the election posts expect it
+def build_conflict_index(client):
+    client.ensure_resolved()
+    index = ConflictIndex()
+    course_info = fetch_course_info(client.sess, client.semester_id)
+    client.resolve()
+    for activity in course_info:
+        mask = week_mask(activity.weeks)
+        index.add_busy(activity.name, [(weekday, unit, mask) for weekday, unit in activity.iter_times()])
+    for course_id, triples in client.catalog().arrange.items():
+        index.add_candidate(course_id, triples)
+    return index
+
+
+# drop the courses which conflict with the timetable, the elected ones are kept to let the server answer
+def drop_conflicted_courses(client, course_id):
+    by_id = client.catalog().by_id
+    conflict_index = client.conflict_index()
+    result = []
+    for i in course_id:
+        if i not in client.elected and conflict_index.conflicts(i):
+            print('[%s] 与已有课程%s时间冲突，已跳过' % (by_id[i][1], '、'.join(conflict_index.conflicts_with(i))))
+        else:
+            result.append(i)
     return result
 
 
+# post data to elect or drop courses in one batch, return the ids of the courses which are done
+def elect_course(client, course_id, course_status):
+    result = client.operate([(i, course_status) for i in course_id])
+    done = []
+    for i in course_id:
+        if result[i]:
+            print(result[i])
+            if re.findall('成功|已经选过|冲突', result[i]):
+                done.append(i)
+        else:
+            print('[%s] 本次操作失败，请务必确保是正确操作(如不要退选不存在的课程等)！' % i)
+    return done
+
+
 # elect course
 def elect_course_interact(sess):
     flag = True
+    client = ElectClient(sess)
     while flag:
-        show_elected_courses(sess)
+        show_elected_courses(client)
         course_no = input('Input course ID(s) (use sapce to separate):').split(' ')
         course_status = input('Input option ([e]:elect course / [d]:drop course):')
-        course_id = [course_no2id(sess, i) for i in course_no]
+        course_id = [course_no2id(client, i) for i in course_no]
         if course_status.lower() == 'e':
+            course_id = drop_conflicted_courses(client, course_id)
             cycle_num = input('Input the cycles to elect course:')
             if cycle_num == 'INFINITY':
                 sleeptime = input('Input the sleep seconds for each cycle(at least one second):')
@@ -463,24 +972,22 @@ def elect_course_interact(sess):
                 print('\n已开启特殊模式，成功选上会自动停止。\n如需提前终止请按Ctrl+C\n\n\n' + '='*60)
                 try:
                     while course_id:
-                        for j in course_id:
-                            result = elect_course(sess, j, 'true')
-                            if result[-1] == '1':
-                                course_id.remove(j)
+                        done = elect_course(client, course_id, 'true')
+                        course_id = [i for i in course_id if i not in done]
+                        if course_id:
                             time.sleep(sleeptime)
                 except KeyboardInterrupt:
                     print('\n' + '='*60 + '\nStopped by user!')
             else:
                 print('\n开始选课\n' + '=' * 60)
                 for i in range(int(cycle_num)):
-                    for j in course_id:
-                        result = elect_course(sess, j, 'true')
-                        if result[-1] == '1':
-                            course_id.remove(j)
+                    if not course_id:
+                        break
+                    done = elect_course(client, course_id, 'true')
+                    course_id = [i for i in course_id if i not in done]
             print('=' * 60 + '\nFinish!')
         elif course_status.lower() == 'd':
-            for i in course_id:
-                elect_course(sess, i, 'false')
+            elect_course(client, course_id, 'false')
         else:
             print('Please input correct option!')
         choice = input('='*60 + '\nGo back to continue?[y/n]:').lower()
@@ -488,45 +995,480 @@ def elect_course_interact(sess):
             flag = False
 
 
-# main
-def main():
-    if test_net():
-        args = docopt(__doc__)  # get program args
-        if args['<username>'] and args['<password>']:
-            sess = log_in(args['<username>'], args['<password>'])
+# waits until all of some events are set, e.g. to hold the project 2 switch until the other queries are done
+class AllEvents(object):
+    def __init__(self, events):
+        self.events = events
+
+    def wait(self):
+        for event in self.events:
+            event.wait()
+
+
+# run the queries of -g, -c and -e concurrently, each one on its own forked session,
+# then print their outputs, or write their records, in the same order as the serial mode
+# the course query switches the server-side session to project 2 only after every other query is done,
+# as they all run on project 1 of the same server-side session
+def run_queries_parallel(sess, args, semester_id, writer=None):
+    from concurrent.futures import ThreadPoolExecutor
+
+    def std_query(s, out, buffer):
+        print_std_detail(s, out, buffer)
+
+    def grade_query(s, out, buffer):
+        print_grade_table(s.get(GRADE_URL), args['<course_category>'], out, buffer)
+
+    def course_query(s, out, buffer):
+        if args['--to']:
+            print_course_tables(s, args['<semester>'], args['--to'], out, switch_ready, buffer, args['<username>'])
         else:
-            username = input('Input your Student ID:')
-            password = getpass.getpass('Input your password:')
-            sess = log_in(username, password)
+            print_course_table(s, semester_id, out, switch_ready, buffer)
+
+    def exam_query(s, out, buffer):
+        print_exam_table(s, semester_id, out, buffer)
+
+    queries = [std_query]
+    if args['-g']:
+        queries.append(grade_query)
+    if args['-c']:
+        queries.append(course_query)
+    if args['-e']:
+        queries.append(exam_query)
+    done = dict((query, threading.Event()) for query in queries if query is not course_query)
+    switch_ready = AllEvents(list(done.values()))
+
+    def run(query):
+        s = fork_session(sess)
+        out = StringIO()
+        buffer = records.RecordBuffer() if writer else None
+        try:
+            query(s, out, buffer)
+        finally:
+            s.close()
+            if query in done:
+                done[query].set()
+        return out, buffer
+
+    with ThreadPoolExecutor(max_workers=len(queries)) as executor:
+        futures = [executor.submit(run, query) for query in queries]
+        for future in futures:
+            out, buffer = future.result()
+            print(out.getvalue(), end='')
+            if buffer:
+                writer.write_all(buffer.records)
+
+
+# run the queries and operations given by the args, writing the query results as records when a writer is given
+def run_args(sess, args, writer=None):
+    if not writer:
         print('='*80)
-        print_std_detail(sess)
-        semester_id = None
-        if args['<semester>']:
-            semester_id = determine_semester_id(sess, args['<semester>'])
+    semester_id = None
+    if args['<semester>']:
+        semester_id = determine_semester_id(sess, args['<semester>'])
+
+    # run the queries concurrently
+    if args['--parallel']:
+        run_queries_parallel(sess, args, semester_id, writer)
+    else:
+        print_std_detail(sess, writer=writer)
 
         # get the grade
         if args['-g']:
             response = sess.get(GRADE_URL)
-            print_grade_table(response, args['<course_category>'])
+            print_grade_table(response, args['<course_category>'], writer=writer)
 
-        # get the course table
-        if args['-c']:
-            print_course_table(sess, semester_id)
+        # get the course table, or the tables of a range of semesters
+        if args['-c'] and args['--to']:
+            print_course_tables(sess, args['<semester>'], args['--to'], writer=writer, username=args['<username>'])
+        elif args['-c']:
+            print_course_table(sess, semester_id, writer=writer)
 
         # get the exams
         if args['-e']:
-            print_exam_table(sess, semester_id)
+            print_exam_table(sess, semester_id, writer=writer)
+
+    # search the electable courses
+    if args['--search']:
+        print_search_result(sess, args['<keyword>'])
 
-        # elect course
-        if args['--elect-course']:
-            elect_course_interact(sess)
+    # elect course
+    if args['--elect-course']:
+        elect_course_interact(sess)
 
+
+# read the (username, password) of the accounts lazily from a credentials file
+def read_credentials(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            if not row or not row[0].strip() or row[0].lstrip().startswith('#'):
+                continue
+            yield row[0].strip(), row[1] if len(row) > 1 else ''
+
+
+# log in to an account with its own session and run the queries of the args, return the printed text
+# or write the results as records bound to the username when a writer is given
+def query_account(base, username, password, args, writer=None):
+    sess = base.fork()
+    sess.cookies.clear()
+    out = StringIO()
+    try:
+        log_in(username, password, sess)
+        if not is_logged_in(sess):
+            raise ValueError('failed to log in, please check the username and password')
+        sess = CachingSession(sess, GET_CACHE_TTL, READONLY_POST_URLS)
+        semester_id = None
+        if args['<semester>']:
+            semester_id = determine_semester_id(sess, args['<semester>'])
+        if writer:
+            writer = writer.bind(username=username)
+        else:
+            print('='*80, file=out)
+            print('学号:%s' % username, file=out)
+        print_std_detail(sess, out, writer)
+        if args['-g']:
+            print_grade_table(sess.get(GRADE_URL), args['<course_category>'], out, writer)
+        if args['-c']:
+            print_course_table(sess, semester_id, out, writer=writer)
+        if args['-e']:
+            print_exam_table(sess, semester_id, out, writer)
+    finally:
         sess.close()
-        if os.path.exists('elect_data'):
-            os.remove('elect_data')
+    return out.getvalue()
+
+
+# query every account of the credentials file with a bounded pool of workers, writing the results as they complete
+# a broken network shows up as failed accounts, failing fast once the circuit breaker of the transport opens
+def run_batch(args, writer=None):
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+    from .transport import Transport, RateLimiter
+    workers = int(args['--workers'])
+    base = Transport(pool_size=workers, limiter=RateLimiter(float(args['--rate'])))
+    done = failed = 0
+    pending = {}  # future -> username
+    accounts = read_credentials(args['<credentials_file>'])
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            # keep only a few accounts queued, so the memory stays flat however many there are
+            for username, password in accounts:
+                pending[executor.submit(query_account, base, username, password, args, writer)] = username
+                if len(pending) >= workers * 2:
+                    break
+            if not pending:
+                break
+            finished, unfinished = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                username = pending.pop(future)
+                done += 1
+                try:
+                    print(future.result(), end='', flush=True)
+                except (Exception, SystemExit) as e:
+                    failed += 1
+                    print('%s: %s' % (username, str(e) or type(e).__name__), file=sys.stderr, flush=True)
+    base.close()
+    print('%d accounts queried, %d failed' % (done, failed), file=sys.stderr)
+    if failed:
+        exit(1)
+
+
+# print an event of a new or changed grade or exam
+def print_change_event(event):
+    change = '新增' if event['change'] == 'new' else '变更'
+    if event['type'] == 'grade':
+        print('[%s] %s成绩: %s类 %s 学分:%s 成绩:%s' % (time.strftime('%Y-%m-%d %H:%M:%S'), change, event['category'],
+                                                  event['name'], event['credit'], event['score']))
     else:
-        print('Failed to connect the NKU-EAMIS system!\n')
+        print('[%s] %s考试: %s %s %s %s' % (time.strftime('%Y-%m-%d %H:%M:%S'), change, event['name'], event['date'],
+                                          event['time'], event['location']))
+
+
+# poll the grades and exams until interrupted, reporting only the new or changed ones
+# relogin is called to log in again when the session has expired
+# a failed poll, e.g. a RequestException or a CircuitOpenError of the transport, is reported and tried again later
+def watch_changes(sess, args, relogin, writer=None):
+    import requests
+    from . import watch
+
+    def fetch(url):
+        def get(headers):
+            response = sess.get(url, headers=headers)
+            if response.url.startswith(LOGIN_URL):
+                relogin()
+                response = sess.get(url, headers=headers)
+            return response
+        return get
+
+    sources = []
+    if args['-g']:
+        cat_list_str = normalize_cat_list(args['<course_category>'])
+
+        def parse_grades(content):
+            grades = records.grade_records(GradeBook(content), cat_list_str)
+            return watch.key_records((i for i in grades if i['type'] == 'grade'), ('category', 'name'))
+        sources.append(watch.WatchSource('grades', fetch(GRADE_URL), parse_grades))
+    if args['-e']:
+        semester_id = determine_semester_id(sess, args['<semester>']) if args['<semester>'] else None
+        exam_id = get_exam_batch_id(sess, semester_id)
+        if exam_id is not None:
+            sources.append(watch.WatchSource('exams', fetch(EXAM_URL + '?examBatch.id=%s' % exam_id),
+                                             lambda content: watch.key_records(
+                                                 records.exam_records(parse_exam_table(content)), ('name',))))
+    if not sources:
+        raise QueryError('Nothing to watch, please give -g <course_category> or -e!')
+
+    def on_events(events):
+        if writer:
+            writer.write_all(events)
+        else:
+            for event in events:
+                print_change_event(event)
+        if args['--hook']:
+            watch.run_hook(args['--hook'], events)
+
+    def on_error(source, error, delay):
+        print('[%s] Failed to poll the %s, trying again in %.0f seconds: %s' % (
+            time.strftime('%Y-%m-%d %H:%M:%S'), source.name, delay, error), file=sys.stderr)
+
+    print('Watching the %s every %s seconds, press Ctrl+C to stop' % (
+        ' and '.join(i.name for i in sources), args['--interval']), file=sys.stderr)
+    try:
+        watch.watch(sources, float(args['--interval']), on_events, errors=(requests.RequestException,),
+                    on_error=on_error)
+    except KeyboardInterrupt:
+        print('Stopped by user! %s' % ', '.join('%s: %d polls, %d parsed' % (i.name, i.polls, i.parses)
+                                                 for i in sources), file=sys.stderr)
+
+
+# download and parse everything of an account into the local store, print what changed
+@profiled('sync', 'stage')
+def sync_account(sess, username, semester=None):
+    from .store import Store
+    with Store() as store:
+        def put(kind, table, key, rows):
+            changed = store.put_rows(table, key, rows)
+            print('%-10s %5d rows, %s' % (kind, len(rows), 'updated' if changed else 'unchanged'))
+
+        put('semesters', 'semesters', (), refresh_semester_index(sess))
+        semester_id = None
+        if semester:
+            semester_id = store.find_semester_id(semester)
+            if semester_id is None:
+                raise QueryError('Failed to find your semester, please make sure that you\'ve correctly inputed!')
+        std_detail = get_std_detail(sess.get(STD_DETAIL_URL + '?projectId=1').content.decode())
+        if not std_detail:
+            raise QueryError('Failed to get your detail, please check your username and password!')
+        grade_book = GradeBook(sess.get(GRADE_URL).content.decode())
+        put('grades', 'grades', (username,),
+            [[cat] + row for cat in sorted(grade_book.rows) for row in grade_book.rows[cat]])
+
+        # the course table page sets the cookie of the current semester, which goes into the semester index
+        course_info = fetch_course_info(sess, semester_id)
+        current_id = get_semester_index().current_id() or ''
+        put('student', 'students', (username,), [std_detail[0] + (current_id,)])
+        put('courses', 'courses', (username, semester_id or current_id), activity_rows(course_info))
+        exams = fetch_exams(sess, semester_id) or []
+        put('exams', 'exams', (username, semester_id or current_id),
+            [(i.name, i.date, i.time, i.location) for i in exams])
+
+        url_ids = find_elect_urlids(sess.get(ELECT_URL + '?projectId=1').content.decode())
+        if url_ids:
+            catalog = get_catalog(sess)
+            put('catalog', 'catalog', (url_ids[0],),
+                [i + (json.dumps(catalog.arrange.get(i[0], [])),) for i in catalog.courses])
+
+
+# open a logged-in session for the daemon with the password, None if failed
+# the sessions cached on disk are never used, since they'd let a request without the password in
+def open_session(username, password):
+    from .transport import Transport
+    sess = Transport()
+    if password:
+        log_in(username, password, sess)
+        if is_logged_in(sess):
+            return sess
+    sess.close()
+    return None
+
+
+# get the id of the semester parameter of a daemon request, None for the current one
+def semester_param(sess, params):
+    return determine_semester_id(sess, params['semester']) if params['semester'] else None
+
+
+# render the electable courses of a catalog, or only those matching the keyword of the query
+def render_catalog(catalog, query):
+    courses = catalog.search_index().search(query['keyword']) if query.get('keyword') else catalog.courses
+    return [{'type': 'catalog', 'id': i[0], 'no': i[1], 'name': i[2], 'teachers': i[3], 'rooms': i[4]}
+            for i in courses]
+
+
+# the resources served by the daemon, each fetched as a model and rendered as records
+def daemon_resources():
+    from .daemon import Resource
+    return [
+        Resource('std', lambda sess, params: get_std_detail(sess.get(STD_DETAIL_URL + '?projectId=1').content.decode()),
+                 lambda detail, query: [j for i in detail[:1] for j in records.student_records(i)], DAEMON_TTL['std']),
+        Resource('grades', lambda sess, params: GradeBook(sess.get(GRADE_URL).content.decode()),
+                 lambda grade_book, query: list(records.grade_records(
+                     grade_book, normalize_cat_list(query.get('categories', '')) or 'ABCDE')), DAEMON_TTL['grades']),
+        Resource('courses', lambda sess, params: fetch_course_info(sess, semester_param(sess, params)),
+                 lambda course_info, query: list(records.course_records(course_info)), DAEMON_TTL['courses'],
+                 ('semester',)),
+        Resource('exams', lambda sess, params: fetch_exams(sess, semester_param(sess, params), sys.stderr) or [],
+                 lambda exams, query: list(records.exam_records(exams)), DAEMON_TTL['exams'], ('semester',)),
+        Resource('catalog', lambda sess, params: get_catalog(sess), render_catalog, DAEMON_TTL['catalog']),
+    ]
+
+
+# serve the queries of any number of users as a local JSON API until Ctrl+C
+# over TCP the requests need a token, written to a file only you can read, a Unix socket is only yours anyway
+def run_daemon(args):
+    import asyncio
+    import secrets
+    from .daemon import Daemon
+    token = token_path = None
+    if '/' not in args['--listen']:
+        token = secrets.token_urlsafe(32)
+        token_path = os.path.join(session_cache.get_cache_dir(), DAEMON_TOKEN_FILE)
+        session_cache.write_private_file(token_path, token)
+    daemon = Daemon(daemon_resources(), open_session, is_logged_in, int(args['--workers']), token)
+
+    def on_ready(server):
+        address = server.sockets[0].getsockname()
+        print('Serving the JSON API on %s, press Ctrl+C to stop' % (
+            address if isinstance(address, str) else 'http://%s:%d' % address[:2]), file=sys.stderr)
+        if token_path:
+            print('Send the token in %s as \'Authorization: Bearer <token>\'' % token_path, file=sys.stderr)
+    try:
+        asyncio.run(daemon.serve(args['--listen'], on_ready))
+    except KeyboardInterrupt:
+        print('Stopped by user! %s' % json.dumps(daemon.stats()), file=sys.stderr)
+    finally:
+        daemon.close()
+        if token_path:
+            os.remove(token_path)
+
+
+# answer the queries of the args from the local store, without logging in
+def run_offline(args, writer=None):
+    from .store import Store
+    with Store() as store:
+        usernames = store.usernames()
+        username = args['<username>'] or (usernames[0] if len(usernames) == 1 else input('Input your Student ID:'))
+
+        # search the latest synced catalog
+        if args['--search']:
+            keys = store.synced_keys('catalog')
+            if not keys:
+                raise QueryError('There is no catalog in the local store, please sync it first!')
+            rows = store.get_rows('catalog', keys[0])
+            render_search_result(Catalog([tuple(i[:5]) for i in rows],
+                                         dict((i[0], [tuple(j) for j in json.loads(i[5])]) for i in rows)),
+                                 args['<keyword>'])
+            return
+
+        student = store.get_rows('students', (username,))
+        if not student:
+            raise QueryError('%s isn\'t in the local store, please sync it first!' % username)
+        semester_id = student[0][3]
+        if args['<semester>']:
+            semester_id = store.find_semester_id(args['<semester>'])
+            if semester_id is None:
+                raise QueryError('Failed to find your semester in the local store, please sync it first!')
+        if not writer:
+            print('='*80)
+        render_std_detail(student[0][:3], writer=writer)
+        if args['-g']:
+            grade_book = GradeBook()
+            for row in store.get_rows('grades', (username,)) or []:
+                grade_book.add_row(row[0], list(row[1:]))
+            render_grade_book(grade_book, args['<course_category>'], writer=writer)
+        missing = 'The %s of the semester aren\'t in the local store, please sync it first!'
+        if args['-c']:
+            rows = store.get_rows('courses', (username, semester_id))
+            if rows is None:
+                print(missing % 'courses', file=sys.stderr if writer else None)
+            else:
+                render_course_table(activities_from_rows(rows), writer=writer)
+        if args['-e']:
+            rows = store.get_rows('exams', (username, semester_id))
+            if rows is None:
+                print(missing % 'exams', file=sys.stderr if writer else None)
+            else:
+                render_exam_table([ExamRecord(*i) for i in rows], writer=writer)
+
+
+# main
+def main():
+    args = docopt(__doc__)  # get program args, before importing anything heavy
+    if args['--to'] and not args['<semester>']:
+        print('--to needs the first semester given with -s!')
+        exit(1)
+    writer = None
+    if args['--format'] and args['--format'] != 'table':
+        try:
+            writer = records.RecordWriter(args['--format'], sys.stdout)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            exit(1)
+    if args['--offline']:
+        try:
+            run_offline(args, writer)
+        except QueryError as e:
+            print(e, file=sys.stderr)
+            exit(1)
+        finally:
+            if writer:
+                writer.close()
+        return
+    import requests
+    from .transport import Transport
+    recorder = None
+    if args['--profile'] or args['--trace']:
+        recorder = profiling.Recorder()
+        profiling.subscribe(recorder)
+    try:
+        if args['--batch']:
+            run_batch(args, writer)
+            return
+        if args['--daemon']:
+            run_daemon(args)
+            return
+        username = args['<username>'] = args['<username>'] or input('Input your Student ID:')
+        if args['--no-cache']:
+            sess = log_in(username, args['<password>'] or getpass.getpass('Input your password:'), Transport())
+        else:
+            sess = cached_log_in(username, args['<password>'])
+        sess = CachingSession(sess, GET_CACHE_TTL, READONLY_POST_URLS)
+        if args['--sync']:
+            sync_account(sess, username, args['<semester>'])
+        elif args['--watch']:
+            # an unattended watch can't wait for a password to be typed, so it needs -p to log in again
+            def relogin():
+                if not args['<password>']:
+                    raise QueryError('The session has expired, please give the password with -p to keep watching!')
+                log_in(username, args['<password>'], sess)
+                if not is_logged_in(sess):
+                    raise QueryError('Failed to log in again, please check your username and password!')
+            watch_changes(sess, args, relogin, writer)
+        else:
+            run_args(sess, args, writer)
+        if args['--profile']:
+            print(sess.stats(), file=sys.stderr)
+        sess.close()
+    except requests.RequestException as e:
+        print('Failed to connect the NKU-EAMIS system!\n%s\n' % e, file=sys.stderr)
+        exit(1)
+    except QueryError as e:
+        print(e, file=sys.stderr)
+        exit(1)
+    finally:
+        if writer:
+            writer.close()
+        if recorder:
+            print(recorder.summary(), file=sys.stderr)
+            if args['--trace']:
+                recorder.write_trace(args['--trace'])
+
 
 if __name__ == '__main__':
     main()
-
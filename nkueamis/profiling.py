@@ -0,0 +1,121 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : profiling.py
+# @Project : NKU-EAMIS
+
+"""
+Instrumentation of the stages of a run: logging in, fetching each page, parsing and rendering.
+
+Every finished stage is a Span passed to the subscribed hooks, e.g.
+
+    from nkueamis import profiling
+    profiling.subscribe(lambda span: exporter.observe(span.category, span.name, span.duration))
+
+Recorder is the hook behind `--profile`, which prints a summary and can write a Chrome trace-event file.
+"""
+
+import os
+import json
+import time
+import threading
+from functools import wraps
+from contextlib import contextmanager
+
+hooks = []
+
+
+class Span(object):
+    __slots__ = ('name', 'category', 'start', 'end', 'bytes', 'redirects', 'thread')
+
+    def __init__(self, name, category, start, end, bytes=0, redirects=0):
+        self.name = name
+        self.category = category  # 'stage', 'fetch', 'parse' or 'render'
+        self.start = start
+        self.end = end
+        self.bytes = bytes
+        self.redirects = redirects
+        self.thread = threading.get_ident()
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+
+# subscribe a hook which is called with every finished span
+def subscribe(hook):
+    hooks.append(hook)
+
+
+def unsubscribe(hook):
+    hooks.remove(hook)
+
+
+# pass a finished span to the hooks
+def record(name, category, start, end, bytes=0, redirects=0):
+    if hooks:
+        span = Span(name, category, start, end, bytes, redirects)
+        for hook in list(hooks):
+            hook(span)
+
+
+# time the code in a with block as a span
+@contextmanager
+def stage(name, category='stage'):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, category, start, time.perf_counter())
+
+
+# time every call of a function as a span
+def profiled(name, category='parse'):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name, category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class Recorder(object):
+    def __init__(self):
+        self.spans = []
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+
+    def __call__(self, span):
+        with self.lock:
+            self.spans.append(span)
+
+    # get the summary table of the spans grouped by category and name
+    def summary(self):
+        groups = {}
+        for span in self.spans:
+            group = groups.setdefault((span.category, span.name), [0, 0.0, 0, 0])
+            group[0] += 1
+            group[1] += span.duration
+            group[2] += span.bytes
+            group[3] += span.redirects
+        lines = ['%-8s %-40s %6s %10s %10s %9s' % ('category', 'name', 'calls', 'ms', 'KB', 'redirects')]
+        for (category, name), (calls, duration, size, redirects) in sorted(groups.items(), key=lambda i: -i[1][1]):
+            lines.append('%-8s %-40s %6d %10.1f %10.1f %9d'
+                         % (category, name[:40], calls, duration * 1e3, size / 1024, redirects))
+        return '\n'.join(lines)
+
+    # write the spans as a Chrome trace-event file, which can be opened in chrome://tracing or Perfetto
+    def write_trace(self, path):
+        pid = os.getpid()
+        events = [{
+            'name': span.name,
+            'cat': span.category,
+            'ph': 'X',
+            'ts': (span.start - self.origin) * 1e6,
+            'dur': span.duration * 1e6,
+            'pid': pid,
+            'tid': span.thread,
+            'args': {'bytes': span.bytes, 'redirects': span.redirects},
+        } for span in self.spans]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
@@ -0,0 +1,154 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : records.py
+# @Project : NKU-EAMIS
+
+"""
+Machine-readable output of the queries as a stream of flat records.
+
+Every record is a dict with a 'type' ('student', 'grade', 'grade_summary', 'course' or 'exam') and some of FIELDS;
+the course records of a range of semesters carry their 'semester'.
+RecordWriter writes them one by one as a JSON array, JSON Lines or CSV (with all of FIELDS as columns), so nothing
+is buffered and no table is built. The writer is thread-safe, the records of one write_all() are never interleaved
+with those of another thread, and bind() gives a writer adding fields like the username to every record.
+"""
+
+import csv
+import json
+import threading
+
+FORMATS = ('json', 'jsonl', 'csv')
+FIELDS = ['type', 'username', 'semester', 'name', 'department', 'major', 'category', 'credit', 'score', 'teacher',
+          'room', 'weekday', 'start_unit', 'end_unit', 'weeks', 'date', 'time', 'location']
+
+
+class RecordWriter(object):
+    def __init__(self, fmt, out):
+        if fmt not in FORMATS:
+            raise ValueError('unknown format %r, must be one of %s' % (fmt, ', '.join(FORMATS)))
+        self.fmt = fmt
+        self.out = out
+        self.count = 0
+        self.lock = threading.Lock()
+        if fmt == 'csv':
+            self.csv = csv.DictWriter(out, FIELDS, extrasaction='ignore', lineterminator='\n')
+            self.csv.writeheader()
+        elif fmt == 'json':
+            out.write('[')
+
+    def write(self, record):
+        with self.lock:
+            self.write_unlocked(record)
+
+    # write the records of a table together, so that the tables written by other threads don't interleave with it
+    def write_all(self, records):
+        with self.lock:
+            for record in records:
+                self.write_unlocked(record)
+            self.out.flush()
+
+    def write_unlocked(self, record):
+        if self.fmt == 'csv':
+            self.csv.writerow(record)
+        elif self.fmt == 'jsonl':
+            self.out.write(json.dumps(record, ensure_ascii=False) + '\n')
+        else:
+            self.out.write((',\n' if self.count else '\n') + json.dumps(record, ensure_ascii=False))
+        self.count += 1
+
+    def flush(self):
+        with self.lock:
+            self.out.flush()
+
+    # get a writer adding the fields to every record
+    def bind(self, **fields):
+        return BoundWriter(self, fields)
+
+    def close(self):
+        if self.fmt == 'json':
+            self.out.write('\n]\n' if self.count else ']\n')
+        self.flush()
+
+
+# a writer keeping the records in memory, e.g. to write the results of concurrent queries in a fixed order
+class RecordBuffer(object):
+    def __init__(self):
+        self.records = []
+
+    def write(self, record):
+        self.records.append(record)
+
+    def write_all(self, records):
+        self.records.extend(records)
+
+    def flush(self):
+        pass
+
+    def bind(self, **fields):
+        return BoundWriter(self, fields)
+
+
+class BoundWriter(object):
+    def __init__(self, writer, fields):
+        self.writer = writer
+        self.fields = fields
+
+    def bind_record(self, record):
+        bound = dict(self.fields)
+        bound.update(record)
+        return bound
+
+    def write(self, record):
+        self.writer.write(self.bind_record(record))
+
+    def write_all(self, records):
+        self.writer.write_all(self.bind_record(i) for i in records)
+
+
+# format a week string like '0111111110111' as '1-8,10-12'
+def week_ranges(weeks):
+    ranges = []
+    start = None
+    for i, bit in enumerate(weeks + '0'):
+        if bit == '1' and start is None:
+            start = i
+        elif bit != '1' and start is not None:
+            ranges.append(str(start) if start == i - 1 else '%d-%d' % (start, i - 1))
+            start = None
+    return ','.join(ranges)
+
+
+def student_records(detail):
+    name, department, major = detail
+    yield {'type': 'student', 'name': name, 'department': department, 'major': major}
+
+
+# the grade rows of the categories like 'BCD', then the credits and the weighted average of them
+def grade_records(grade_book, cat_list_str):
+    for cat, rows in zip(cat_list_str, grade_book.select(cat_list_str)):
+        for name, credit, score in rows:
+            yield {'type': 'grade', 'category': cat, 'name': name, 'credit': credit, 'score': score}
+    average, credits = grade_book.summary(cat_list_str)
+    yield {'type': 'grade_summary', 'category': cat_list_str, 'credit': credits, 'score': round(average, 4)}
+
+
+# a record for every run of consecutive units of every weekday of the activities, numbered from 1
+def course_records(activities):
+    for activity in activities:
+        units = {}
+        for weekday, unit in activity.iter_times():
+            units.setdefault(weekday, []).append(unit)
+        for weekday in sorted(units):
+            run = sorted(units[weekday])
+            start = 0
+            for i in range(1, len(run) + 1):
+                if i == len(run) or run[i] != run[i - 1] + 1:
+                    yield {'type': 'course', 'name': activity.name, 'teacher': activity.teacher,
+                           'room': activity.room, 'weekday': weekday + 1, 'start_unit': run[start] + 1,
+                           'end_unit': run[i - 1] + 1, 'weeks': week_ranges(activity.weeks)}
+                    start = i
+
+
+def exam_records(exams):
+    for exam in exams:
+        yield {'type': 'exam', 'name': exam.name, 'date': exam.date, 'time': exam.time, 'location': exam.location}
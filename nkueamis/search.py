@@ -0,0 +1,85 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : search.py
+# @Project : NKU-EAMIS
+
+"""
+Full-text search over the electable courses.
+
+Chinese text has no spaces to split on, so the course no, name, teachers and rooms are indexed by their
+character bigrams (and single characters for one-character queries). A query term matches a course when it
+is a substring of one of these fields, or a prefix of one when the term starts with '^' (of any of the teachers
+or rooms, which are comma-separated); all the terms of a query must match.
+"""
+
+import unicodedata
+
+FIELDS = (1, 2, 3, 4)  # no, name, teachers, rooms of a catalog course
+MULTI_VALUED = (3, 4)  # the fields holding comma-separated values
+
+
+# normalize text for searching, e.g. full-width letters and 'Ⅱ' become 'II'
+def normalize(text):
+    return unicodedata.normalize('NFKC', text).lower()
+
+
+# get the keys to look up in the index for a term
+def gram_keys(term):
+    if len(term) == 1:
+        return [term]
+    return set(term[i:i+2] for i in range(len(term) - 1))
+
+
+class CourseIndex(object):
+    def __init__(self, courses):
+        self.courses = courses  # [(id, no, name, teachers, rooms)]
+        self.fields = []  # normalized fields of every course
+        self.values = []  # normalized values of every course, the multi-valued fields split, for prefix matches
+        self.postings = {}  # bigram or character -> set of course positions
+        for n, course in enumerate(courses):
+            fields = [normalize(course[i]) for i in FIELDS]
+            self.fields.append(fields)
+            self.values.append([value.strip() for i, field in zip(FIELDS, fields)
+                                for value in (field.split(',') if i in MULTI_VALUED else [field])])
+            for field in fields:
+                for i in range(len(field)):
+                    self.postings.setdefault(field[i], set()).add(n)
+                    if i + 1 < len(field):
+                        self.postings.setdefault(field[i:i+2], set()).add(n)
+
+    # get the positions of the courses which may contain a term
+    def candidates(self, term):
+        postings = []
+        for key in gram_keys(term):
+            posting = self.postings.get(key)
+            if not posting:
+                return set()
+            postings.append(posting)
+        postings.sort(key=len)
+        return postings[0].intersection(*postings[1:])
+
+    # check whether a course matches a term
+    def match(self, n, term, prefix):
+        if prefix:
+            return any(value.startswith(term) for value in self.values[n])
+        return any(term in field for field in self.fields[n])
+
+    # search the courses matching all the terms of a query, in the order of the catalog
+    def search(self, query, limit=None):
+        terms = [normalize(i) for i in query.split()]
+        result = None
+        for term in sorted(terms, key=len, reverse=True):
+            prefix = term.startswith('^')
+            if prefix:
+                term = term[1:]
+            if not term:
+                continue
+            found = self.candidates(term)
+            if result is not None:
+                found &= result
+            result = set(n for n in found if self.match(n, term, prefix))
+            if not result:
+                break
+        if result is None:
+            return []
+        return [self.courses[n] for n in sorted(result)[:limit]]
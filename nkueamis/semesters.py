@@ -0,0 +1,104 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : semesters.py
+# @Project : NKU-EAMIS
+
+"""
+Index of the semester calendar, cached on disk.
+
+It maps semesters like '2016-2017:2' to their ids and back with dicts, and remembers the current semester id from
+the semester.id cookie the server sets, for CURRENT_TTL seconds. The calendar itself is only downloaded again when a
+semester isn't found in it.
+"""
+
+import json
+import os
+import threading
+import time
+
+from .session_cache import get_cache_dir, write_private_file
+
+INDEX_VERSION = 1
+INDEX_FILE = 'semesters.json'
+CURRENT_TTL = 12 * 3600
+
+
+class SemesterIndex(object):
+    def __init__(self, semesters=(), current=None, current_seen=0, fetched=0):
+        self.by_name = {}  # '2016-2017:2' -> id
+        self.by_id = {}  # id -> '2016-2017:2'
+        self.current = current
+        self.current_seen = current_seen
+        self.fetched = fetched
+        self.lock = threading.Lock()
+        self.update(semesters)
+
+    # add the (id, school year, name) of the semesters
+    def update(self, semesters):
+        with self.lock:
+            for semester_id, school_year, name in semesters:
+                key = '%s:%s' % (school_year, name)
+                self.by_name[key] = semester_id
+                self.by_id[semester_id] = key
+
+    def id_of(self, semester):
+        return self.by_name.get(semester)
+
+    def name_of(self, semester_id):
+        return self.by_id.get(semester_id)
+
+    # get the current semester id seen within the ttl, None if unknown
+    def current_id(self, ttl=CURRENT_TTL):
+        if self.current and time.time() - self.current_seen < ttl:
+            return self.current
+        return None
+
+    # remember the current semester id, return whether it's news
+    def set_current(self, semester_id):
+        with self.lock:
+            known = self.current == semester_id and self.current_id() is not None
+            self.current = semester_id
+            self.current_seen = time.time()
+        return not known
+
+    # get the ids of the semesters from one to another in calendar order, both included
+    def between(self, first_id, last_id):
+        first, last = sorted((self.by_id[first_id], self.by_id[last_id]))
+        return [self.by_name[i] for i in sorted(self.by_name) if first <= i <= last]
+
+    # check whether a semester is before the current one, False when the current one is unknown
+    def finished(self, semester_id):
+        current = self.current_id()
+        return bool(current) and current in self.by_id and self.by_id.get(semester_id, '~') < self.by_id[current]
+
+    def semesters(self):
+        with self.lock:
+            return [(v,) + tuple(k.split(':', 1)) for k, v in self.by_name.items()]
+
+
+def index_path():
+    return os.path.join(get_cache_dir(), INDEX_FILE)
+
+
+# load the cached index, an empty one if missing or written by another version
+def load_index():
+    try:
+        with open(index_path(), encoding='utf-8') as f:
+            data = json.load(f)
+        if data['version'] != INDEX_VERSION:
+            return SemesterIndex()
+        return SemesterIndex([tuple(i) for i in data['semesters']], data['current'], data['current_seen'],
+                             data['fetched'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return SemesterIndex()
+
+
+def save_index(index):
+    data = {
+        'version': INDEX_VERSION,
+        'fetched': index.fetched,
+        'current': index.current,
+        'current_seen': index.current_seen,
+        'semesters': index.semesters(),
+    }
+    write_private_file(index_path(), json.dumps(data, ensure_ascii=False, separators=(',', ':')))
@@ -0,0 +1,80 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : session_cache.py
+# @Project : NKU-EAMIS
+
+"""
+On-disk store of logged-in sessions, one cookie file per username.
+
+The files are only readable by the current user, since a valid JSESSIONID is as good as the password.
+"""
+
+import os
+import re
+import json
+import time
+import tempfile
+
+SESSION_DIR = 'sessions'
+
+
+# get the cache directory of nkueamis, create it if necessary
+def get_cache_dir():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    path = os.path.join(base, 'nkueamis')
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    return path
+
+
+# write a file atomically, with permissions only for the owner
+# the temporary file gets a unique name, so that threads and processes writing the same file don't share it
+def write_private_file(path, data):
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+# get the path of the cookie file of a username
+def session_path(username):
+    path = os.path.join(get_cache_dir(), SESSION_DIR)
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    return os.path.join(path, re.sub(r'[^\w.-]', '_', username) + '.json')
+
+
+# load the cached cookies of a username into a cookie jar, return whether there were any
+def load_cookies(username, jar):
+    try:
+        with open(session_path(username), encoding='utf-8') as f:
+            cookies = json.load(f)['cookies']
+    except (OSError, ValueError, KeyError):
+        return False
+    now = time.time()
+    for c in cookies:
+        if c['expires'] and c['expires'] < now:
+            continue
+        jar.set(c['name'], c['value'], domain=c['domain'], path=c['path'],
+                expires=c['expires'], secure=c['secure'])
+    return bool(jar)
+
+
+# save the cookies of a logged-in session
+def save_cookies(username, jar):
+    cookies = [{'name': c.name, 'value': c.value, 'domain': c.domain, 'path': c.path,
+                'expires': c.expires, 'secure': c.secure} for c in jar]
+    write_private_file(session_path(username), json.dumps({'saved': time.time(), 'cookies': cookies}))
+
+
+# drop the cached cookies of a username
+def drop_cookies(username):
+    try:
+        os.remove(session_path(username))
+    except OSError:
+        pass
@@ -0,0 +1,430 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : standin.py
+# @Project : NKU-EAMIS
+
+"""
+Usage:
+    standin [--port=<port>] [--latency=<seconds>] [--size=<rows>] [--session-ttl=<seconds>] [--recordings=<dir>]
+            [--seed=<seed>] [--no-etags] [--error-rate=<ratio>]
+
+Run it with `python3 -m nkueamis.standin`. An offline stand-in of NKU-EAMIS for development, benchmarks and the
+batch/daemon modes, serving synthetic pages (or recorded ones) for every endpoint nkueamis uses. Point nkueamis at it
+with the NKUEAMIS_HOME_URL environment variable, e.g. `NKUEAMIS_HOME_URL=http://127.0.0.1:8080 nkueamis -c -u 1 -p 1`.
+Faults (503s, slow answers and connection resets) can be injected with StandIn.inject_fault(), e.g. by the tests.
+
+Options:
+    --port=<port>               port to listen on [default: 8080]
+    --latency=<seconds>         delay of every response [default: 0]
+    --size=<rows>               rows of grades, course activities, exams and ten times of electable courses [default: 50]
+    --session-ttl=<seconds>     seconds until a session expires, 0 for never [default: 0]
+    --recordings=<dir>          serve the file named like the endpoint (e.g. 'stdExam!examTable.action') when it exists
+    --seed=<seed>               random seed of the synthetic pages [default: 0]
+    --no-etags                  don't send ETags nor answer conditional GETs with 304
+    --error-rate=<ratio>        ratio of the requests answered with 503 [default: 0]
+"""
+
+import os
+import time
+import socket
+import struct
+import uuid
+import hashlib
+import random
+import threading
+from collections import Counter
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COURSE_CAT = ['校公共必修课', '院系公共必修课', '专业必修课', '专业选修课', '任选课']
+SEMESTERS = [(str(20 + i), '%d-%d' % (year, year + 1), term)
+             for i, (year, term) in enumerate((y, t) for y in range(2014, 2019) for t in '12')]
+CURRENT_SEMESTER_ID = SEMESTERS[-3][0]
+PROFILE_ID = '121'
+EXAM_BATCH_ID = '501'
+NAME_WORDS = ['高等', '数学', '线性', '代数', '大学', '英语', '物理', '化学', '程序', '设计', '数据', '结构',
+              '概率', '统计', '经济', '管理', '哲学', '历史', '文学', '艺术', '体育', '计算机', '网络', '系统']
+SURNAMES = '王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗'
+GIVEN_NAMES = '伟芳娜敏静丽强磊军洋勇艳杰涛明超秀霞平刚'
+BUILDINGS = ['主楼', '一教', '二主楼', '公教楼', '津南A', '津南B']
+
+ACTIVITY_TEMPLATE = '''
+\t\tvar teachers = [{id:%(tid)d,name:"教师%(tid)d",lab:false}];
+\t\tvar actTeachers = [{id:%(tid)d,name:"教师%(tid)d",lab:false}];
+\t\tvar assistant = _.filter(actTeachers, function(actTeacher) {
+\t\t\treturn (_.where(teachers, {id:actTeacher.id,name:actTeacher.name,lab:actTeacher.lab}).length == 0) && (actTeacher.lab == true);
+\t\t});
+\t\tvar actTeacherId = [];
+\t\tvar actTeacherName = [];
+\t\tactivity = new TaskActivity(actTeacherId.join(','),actTeacherName.join(','),"%(id)s(%(code)s)","%(name)s(%(code)s)","%(rid)d","教室%(rid)d","%(weeks)s",null,null,assistantName,"","");
+%(indexes)s'''
+INDEX_TEMPLATE = '''\t\tindex =%d*unitCount+%d;
+\t\ttable0.activities[index][table0.activities[index].length]=activity;
+'''
+EXAM_ROW_TEMPLATE = ('<tr class="%(cls)s"><td>%(no)04d</td><td>课程%(no)d</td><td>期末</td><td>%(date)s</td>'
+                     '<td>%(time)s</td><td>%(room)s</td><td>%(seat)d</td><td>%(status)s</td><td></td></tr>\n')
+EXAM_NO_ARRANGE = '<font color="BBC4C3">examTime.noArrange</font>'
+LESSON_TEMPLATE = ("{id:%(id)s,no:'%(no)s',name:'%(name)s',code:'COMP%(no)s',credits:2,courseId:%(id)s,"
+                   "startWeek:1,endWeek:16,courseTypeId:1,courseTypeName:'专业选修课',scheduled:true,"
+                   "withdrawable:true,textbooks:'',teachers:'%(teachers)s',crossCampus:false,remark:'',"
+                   "arrangeInfo:[%(arrange)s]}")
+ARRANGE_TEMPLATE = ("{weekDay:%d,weekState:'%s',startUnit:%d,endUnit:%d,weekStateDigest:'1-16',rooms:'%s'}")
+
+
+# generate the student detail page
+def std_detail_page(name='张三'):
+    return ('<table><tr><td class="title">姓名：</td><td>%s</td></tr>'
+            '<tr><td class="title">院系：</td><td>数学科学学院</td></tr>'
+            '<tr><td class="title">专业：</td><td>信息与计算科学</td></tr></table>' % name)
+
+
+# generate the grade page with n grades in every category
+def grade_page(n, seed=0):
+    r = random.Random(seed)
+    rows = ['<tr><th>序号</th><th>课程代码</th><th>课程名称</th><th>学分</th></tr>']
+    for cat in COURSE_CAT:
+        rows.append('<tr><td colspan="8">%s 要求学分:20 已修学分</td></tr>' % cat)
+        for i in range(n):
+            score = r.choice(['%d' % r.randint(60, 100)] * 6 + ['--', '', '85 (补考)', '通过'])
+            cells = [str(i + 1), 'COMP%04d' % i, '课程%dⅡ' % i, r.choice(['1', '2', '3', '1.5']), '必修', score,
+                     '是', '']
+            rows.append('<tr>%s</tr>' % ''.join('<td>%s</td>' % c for c in cells))
+    return '<table class="gridtable">%s</table>' % '\n'.join(rows)
+
+
+# generate the semester calendar answered by dataQuery.action
+def semester_calendar():
+    semesters = ','.join('{id:%s,schoolYear:"%s",name:"%s"}' % i for i in SEMESTERS)
+    return '{yearDom:"",termDom:"",semesters:{y0:[%s]},yearIndex:"0",termIndex:"0",semesterId:"%s"}' % (
+        semesters, CURRENT_SEMESTER_ID)
+
+
+# generate the course table page with n activities
+def course_table_page(n, seed=0):
+    r = random.Random(seed)
+    activities = []
+    for i in range(n):
+        start = r.randint(1, 8)
+        weeks = '0' * start + '1' * r.randint(1, 16)
+        weekday = r.randint(0, 6)
+        unit = r.randint(0, 12)
+        activities.append(ACTIVITY_TEMPLATE % {
+            'tid': r.randint(1, 999), 'id': i, 'code': 'COMP%04d.01' % i, 'name': '课程%d' % i,
+            'rid': r.randint(1, 999),
+            'weeks': weeks.ljust(53, '0'),
+            'indexes': INDEX_TEMPLATE % (weekday, unit) + INDEX_TEMPLATE % (weekday, unit + 1)})
+    return '<script language="JavaScript">\n\tvar unitCount = 14;\n%s</script>' % ''.join(activities)
+
+
+# generate the exam table page with n rows
+def exam_page(n, seed=0, status_ratio=0.9, arranged_ratio=0.8):
+    r = random.Random(seed)
+    rows = []
+    for i in range(n):
+        arranged = r.random() < arranged_ratio
+        rows.append(EXAM_ROW_TEMPLATE % {
+            'cls': 'griddata-even' if i % 2 else 'griddata-odd', 'no': i % 10000,
+            'date': '2017-06-%02d' % r.randint(1, 30) if arranged else EXAM_NO_ARRANGE,
+            'time': '08:30-10:30' if arranged else EXAM_NO_ARRANGE,
+            'room': '<a href="#">主楼%d</a>' % r.randint(101, 599) if arranged else EXAM_NO_ARRANGE,
+            'seat': r.randint(1, 120), 'status': '正常' if r.random() < status_ratio else '缓考'})
+    return '<html><body><table class="gridtable">\n%s</table></body></html>' % ''.join(rows)
+
+
+# generate a catalog of n electable courses as (id, no, name, teachers, rooms)
+def synthetic_catalog(n, seed=0):
+    r = random.Random(seed)
+    courses = []
+    for i in range(n):
+        name = ''.join(r.sample(NAME_WORDS, r.randint(1, 3))) + r.choice(['', 'Ⅰ', 'Ⅱ', 'Ⅲ'])
+        teachers = ','.join(r.choice(SURNAMES) + r.choice(GIVEN_NAMES) for j in range(r.randint(1, 2)))
+        rooms = '%s%d' % (r.choice(BUILDINGS), r.randint(101, 599))
+        courses.append((str(100000 + i), '%04d' % i, name, teachers, rooms))
+    return courses
+
+
+# generate the arrangement of every course of a synthetic catalog, as course id -> (weekday, weeks, start, end unit)
+def synthetic_arrangements(n, seed=0):
+    r = random.Random(seed)
+    arrangements = {}
+    for course in synthetic_catalog(n, seed):
+        start = r.randint(1, 12)
+        arrangements[course[0]] = (r.randint(1, 7), ('0' + '1' * 16).ljust(53, '0'), start, start + 1)
+    return arrangements
+
+
+# generate the data of electable courses answered by stdElectCourse!data.action
+def elect_data_page(n, seed=0):
+    arrangements = synthetic_arrangements(n, seed)
+    lessons = []
+    for course_id, no, name, teachers, rooms in synthetic_catalog(n, seed):
+        arrange = ARRANGE_TEMPLATE % (arrangements[course_id] + (rooms,))
+        lessons.append(LESSON_TEMPLATE % {'id': course_id, 'no': no, 'name': name, 'teachers': teachers,
+                                          'arrange': arrange})
+    return 'var lessonJSONs = [%s];' % ','.join(lessons)
+
+
+# generate the activities of elected courses of a synthetic catalog, to add to the course table
+def elected_activities(courses, arrangements):
+    activities = []
+    for course_id, no, name, teachers, rooms in courses:
+        weekday, weeks, start, end = arrangements[course_id]
+        activities.append(ACTIVITY_TEMPLATE % {
+            'tid': 1, 'id': int(course_id), 'code': 'COMP%s.01' % no, 'name': name, 'rid': 1, 'weeks': weeks,
+            'indexes': ''.join(INDEX_TEMPLATE % (weekday - 1, unit - 1) for unit in range(start, end + 1))})
+    return '<script language="JavaScript">\n%s</script>' % ''.join(activities)
+
+
+class StandIn(object):
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, size=50, session_ttl=0, recordings=None, seed=0,
+                 etags=True, error_rate=0.0):
+        self.latency = latency
+        self.error_rate = error_rate  # ratio of the requests answered with 503, besides the injected faults
+        self.faults = []  # [kind, path or None for any, requests left, delay]
+        self.random = random.Random(seed)
+        self.etags = etags  # send ETags and answer If-None-Match with 304
+        self.size = size
+        self.session_ttl = session_ttl
+        self.recordings = recordings
+        self.seed = seed
+        self.counts = Counter()  # 'METHOD path' -> requests
+        self.sessions = {}  # JSESSIONID -> logged in time
+        self.projects = {}  # JSESSIONID -> project of the session, switched by any request with a projectId
+        self.pages = {}
+        self.lock = threading.Lock()
+        catalog = synthetic_catalog(size * 10, seed)
+        self.catalog = dict((i[0], i) for i in catalog)
+        self.arrangements = synthetic_arrangements(size * 10, seed)
+        self.elected = set([catalog[0][0]]) if catalog else set()
+        self.server = ThreadingHTTPServer((host, port), self.handler_class())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return 'http://%s:%d' % (host, port)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def reset_counts(self):
+        with self.lock:
+            self.counts.clear()
+
+    def total_requests(self):
+        return sum(self.counts.values())
+
+    # make the next count requests to a path (or to any path) fail: 'error' answers 503, 'slow' answers after
+    # delay seconds, 'reset' resets the connection without answering
+    def inject_fault(self, kind, count=1, path=None, delay=1.0):
+        if kind not in ('error', 'slow', 'reset'):
+            raise ValueError('unknown fault %r' % kind)
+        with self.lock:
+            self.faults.append([kind, path, count, delay])
+
+    def clear_faults(self):
+        with self.lock:
+            del self.faults[:]
+
+    # take the fault of a request, return (kind, delay), kind is None for no fault
+    def take_fault(self, path):
+        with self.lock:
+            for fault in self.faults:
+                if fault[1] in (None, path) and fault[2] > 0:
+                    fault[2] -= 1
+                    return fault[0], fault[3]
+            if self.error_rate and self.random.random() < self.error_rate:
+                return 'error', 0
+        return None, 0
+
+    # get a generated page, built once per name
+    def page(self, name, build):
+        if name not in self.pages:
+            self.pages[name] = build()
+        return self.pages[name]
+
+    def logged_in(self, session_id):
+        with self.lock:
+            logged = self.sessions.get(session_id)
+        return logged is not None and (not self.session_ttl or time.time() - logged < self.session_ttl)
+
+    def log_in(self, username, password):
+        if not username or password == 'wrong':
+            return None
+        session_id = uuid.uuid4().hex.upper()
+        with self.lock:
+            self.sessions[session_id] = time.time()
+        return session_id
+
+    # answer a request, return (status, headers, body)
+    def respond(self, method, path, query, form, cookies):
+        endpoint = path.rsplit('/', 1)[-1]
+        if self.recordings and os.path.isfile(os.path.join(self.recordings, endpoint)):
+            with open(os.path.join(self.recordings, endpoint), encoding='utf-8') as f:
+                return 200, {}, f.read()
+        if endpoint == 'login.action':
+            if method == 'GET':
+                return 200, {}, '<form action="/eams/login.action" method="post"></form>'
+            session_id = self.log_in(form.get('username'), form.get('password'))
+            if not session_id:
+                return 200, {}, '<div class="actionError">密码错误</div>'
+            return 302, {'Location': '/eams/home.action',
+                         'Set-Cookie': 'JSESSIONID=%s; Path=/eams; HttpOnly' % session_id}, ''
+        if not self.logged_in(cookies.get('JSESSIONID')):
+            return 302, {'Location': '/eams/login.action'}, ''
+        with self.lock:
+            if 'projectId' in query:
+                self.projects[cookies['JSESSIONID']] = query['projectId']
+            project_id = self.projects.get(cookies['JSESSIONID'], '1')
+        semester_cookie = {'Set-Cookie': 'semester.id=%s; Path=/eams' % CURRENT_SEMESTER_ID}
+        semester_id = form.get('semester.id') or cookies.get('semester.id') or CURRENT_SEMESTER_ID
+        if endpoint == 'home.action':
+            return 200, {}, '<html>home</html>'
+        if endpoint == 'stdDetail!innerIndex.action':
+            return 200, {}, self.page('std', std_detail_page)
+        if endpoint == 'myPlanCompl!innerIndex.action':
+            # the grades are those of the project the session is on, the minor (project 2) has none
+            if project_id != '1':
+                return 200, {}, self.page('grade%s' % project_id, lambda: grade_page(0))
+            return 200, {}, self.page('grade', lambda: grade_page(self.size, self.seed))
+        if endpoint == 'dataQuery.action':
+            return 200, {}, semester_calendar()
+        if endpoint == 'courseTableForStd.action':
+            return 200, {}, '<html>course table</html>'
+        if endpoint == 'courseTableForStd!innerIndex.action':
+            return 200, semester_cookie, 'bg.form.addInput(form,"ids","%s");' % (600000 + int(query.get('projectId', 1)))
+        if endpoint == 'courseTableForStd!courseTable.action':
+            page = self.page('course%s' % semester_id, lambda: course_table_page(self.size, self.seed + int(semester_id)))
+            if semester_id == CURRENT_SEMESTER_ID:
+                # the courses elected so far are in the table of the current semester
+                with self.lock:
+                    elected = [self.catalog[i] for i in sorted(self.elected)]
+                page += elected_activities(elected, self.arrangements)
+            return 200, {}, page
+        if endpoint == 'stdExam.action':
+            return 200, semester_cookie, "<a href=\"#\" onclick=\"bg.Go('/eams/stdExam!examTable.action?examBatch.id=%s'," \
+                                         "'contentDiv')\">期末考试</a>" % EXAM_BATCH_ID
+        if endpoint == 'stdExam!examTable.action':
+            return 200, {}, self.page('exam', lambda: exam_page(self.size, self.seed))
+        if endpoint == 'stdElectCourse!innerIndex.action':
+            return 200, {}, '<a href="/eams/stdElectCourse!defaultPage.action?electionProfile.id=%s">选课</a>' % PROFILE_ID
+        if endpoint == 'stdElectCourse!defaultPage.action':
+            with self.lock:
+                elected = ''.join('electedIds["l%s"] = true;\n' % i for i in sorted(self.elected))
+            return 200, {}, '<script>var url="x&semesterId=%s";\n%s</script>' % (CURRENT_SEMESTER_ID, elected)
+        if endpoint == 'stdElectCourse!data.action':
+            return 200, {}, self.page('elect', lambda: elect_data_page(self.size * 10, self.seed))
+        if endpoint == 'stdElectCourse!batchOperator.action':
+            return 200, {}, self.operate(form)
+        return 404, {}, 'not found'
+
+    # elect or drop the courses of operator0..N
+    def operate(self, form):
+        messages = []
+        for key in sorted(i for i in form if i.startswith('operator')):
+            course_id, status = form[key].split(':')[:2]
+            course = self.catalog.get(course_id)
+            if not course:
+                continue
+            with self.lock:
+                if status == 'true':
+                    message = '已经选过' if course_id in self.elected else '选课成功'
+                    self.elected.add(course_id)
+                else:
+                    message = '退课成功' if course_id in self.elected else '退课失败:没有选过'
+                    self.elected.discard(course_id)
+            messages.append('%s[%s] %s</br>' % (course[2], course[1], message))
+        return '<div style="width:85%%;color:red">\n%s\n</div>' % '\n'.join(messages)
+
+    def handler_class(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # the headers and the body go out in two writes, which would wait for the delayed ACK of the client
+            # on a kept-alive connection with Nagle's algorithm
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def handle(self):
+                try:
+                    BaseHTTPRequestHandler.handle(self)
+                except ConnectionError:
+                    pass  # the client dropped a kept-alive connection
+
+            def handle_request(self):
+                url = urlsplit(self.path)
+                body = b''
+                if self.command == 'POST':
+                    body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                with standin.lock:
+                    standin.counts['%s %s' % (self.command, url.path)] += 1
+                cookies = {}
+                for item in (self.headers.get('Cookie') or '').split(';'):
+                    if '=' in item:
+                        k, v = item.strip().split('=', 1)
+                        cookies[k] = v
+                query = dict((k, v[0]) for k, v in parse_qs(url.query).items())
+                form = dict((k, v[0]) for k, v in parse_qs(body.decode()).items())
+                if standin.latency:
+                    time.sleep(standin.latency)
+                fault, delay = standin.take_fault(url.path)
+                if fault == 'reset':
+                    # close with a zero linger time, so that the client gets a RST instead of a response
+                    self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+                    self.close_connection = True
+                    return
+                if fault == 'slow':
+                    time.sleep(delay)
+                if fault == 'error':
+                    status, headers, text = 503, {}, 'service unavailable'
+                else:
+                    status, headers, text = standin.respond(self.command, url.path, query, form, cookies)
+                data = text.encode()
+                if standin.etags and status == 200 and self.command == 'GET':
+                    headers = dict(headers, ETag='"%s"' % hashlib.sha1(data).hexdigest()[:16])
+                    if self.headers.get('If-None-Match') == headers['ETag']:
+                        status, data = 304, b''
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html;charset=UTF-8')
+                self.send_header('Content-Length', str(len(data)))
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = handle_request
+
+        return Handler
+
+
+def main():
+    from docopt import docopt
+    args = docopt(__doc__)
+    standin = StandIn(port=int(args['--port']), latency=float(args['--latency']), size=int(args['--size']),
+                      session_ttl=float(args['--session-ttl']), recordings=args['--recordings'],
+                      seed=int(args['--seed']), etags=not args['--no-etags'], error_rate=float(args['--error-rate']))
+    print('Serving the NKU-EAMIS stand-in on %s, press Ctrl+C to stop' % standin.url)
+    try:
+        standin.server.serve_forever()
+    except KeyboardInterrupt:
+        standin.server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : store.py
+# @Project : NKU-EAMIS
+
+"""
+Local SQLite store of the parsed query results, written by `nkueamis --sync` and read by `--offline`.
+
+Every table holds groups of rows, each group identified by its key columns (e.g. the username and the semester)
+and its rows numbered by seq. A group is upserted row by row and the rows left over from a longer old version are
+deleted, and nothing is written at all when the hash of its rows is the one recorded at the last sync. The schema
+version is kept in `PRAGMA user_version`; a store of an unknown version is rebuilt, since it can be synced again.
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+
+from .session_cache import get_cache_dir
+
+SCHEMA_VERSION = 1
+STORE_FILE = 'store.sqlite3'
+# table -> (key columns, value columns)
+TABLES = {
+    'students': (('username',), ('name', 'department', 'major', 'semester')),  # semester: the current one
+    'semesters': ((), ('id', 'school_year', 'name')),
+    'grades': (('username',), ('category', 'name', 'credit', 'score')),
+    'courses': (('username', 'semester'), ('name', 'room', 'teacher', 'weeks', 'times')),
+    'exams': (('username', 'semester'), ('name', 'date', 'time', 'location')),
+    'catalog': (('profile_id',), ('id', 'no', 'name', 'teachers', 'rooms', 'arrange')),
+}
+INDEXES = [
+    'CREATE INDEX catalog_no ON catalog (profile_id, no)',
+]
+MIGRATIONS = {}  # version -> statements upgrading a store from it to the next version
+
+
+# get the path of the store
+def store_path():
+    return os.path.join(get_cache_dir(), STORE_FILE)
+
+
+class Store(object):
+    def __init__(self, path=None):
+        self.path = path or store_path()
+        self.conn = sqlite3.connect(self.path)
+        with self.conn:
+            self.migrate()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    # create the schema, or bring an older one up to SCHEMA_VERSION
+    def migrate(self):
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        while 0 < version < SCHEMA_VERSION and version in MIGRATIONS:
+            for statement in MIGRATIONS[version]:
+                self.conn.execute(statement)
+            version += 1
+        if version == SCHEMA_VERSION:
+            self.conn.execute('PRAGMA user_version = %d' % SCHEMA_VERSION)
+            return
+        for (name,) in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall():
+            self.conn.execute('DROP TABLE "%s"' % name)
+        for table, (key_columns, columns) in TABLES.items():
+            self.conn.execute('CREATE TABLE %s (%s, PRIMARY KEY (%s)) WITHOUT ROWID' % (
+                table, ', '.join(key_columns + ('seq',) + columns), ', '.join(key_columns + ('seq',))))
+        for statement in INDEXES:
+            self.conn.execute(statement)
+        self.conn.execute('CREATE TABLE synced (state PRIMARY KEY, hash, time) WITHOUT ROWID')
+        self.conn.execute('PRAGMA user_version = %d' % SCHEMA_VERSION)
+
+    # upsert a group of rows, return whether anything changed since the last sync
+    def put_rows(self, table, key, rows):
+        key_columns, columns = TABLES[table]
+        rows = [tuple(i) for i in rows]
+        state = '/'.join((table,) + tuple(key))
+        content_hash = hashlib.sha1(repr(rows).encode()).hexdigest()
+        with self.conn:
+            last = self.conn.execute('SELECT hash FROM synced WHERE state = ?', (state,)).fetchone()
+            self.conn.execute('INSERT OR REPLACE INTO synced VALUES (?, ?, ?)', (state, content_hash, time.time()))
+            if last and last[0] == content_hash:
+                return False
+            all_columns = key_columns + ('seq',) + columns
+            self.conn.executemany(
+                'INSERT INTO %s (%s) VALUES (%s) ON CONFLICT (%s) DO UPDATE SET %s' % (
+                    table, ', '.join(all_columns), ', '.join('?' * len(all_columns)),
+                    ', '.join(key_columns + ('seq',)), ', '.join('%s = excluded.%s' % (i, i) for i in columns)),
+                (tuple(key) + (seq,) + row for seq, row in enumerate(rows)))
+            self.conn.execute('DELETE FROM %s WHERE %s' % (table, ' AND '.join(
+                ['%s = ?' % i for i in key_columns] + ['seq >= ?'])), tuple(key) + (len(rows),))
+        return True
+
+    # get the rows of a group in order, None if it was never synced
+    def get_rows(self, table, key):
+        key_columns, columns = TABLES[table]
+        if self.synced_time(table, key) is None:
+            return None
+        where = ' AND '.join('%s = ?' % i for i in key_columns) or '1'
+        return self.conn.execute('SELECT %s FROM %s WHERE %s ORDER BY seq' % (
+            ', '.join(columns), table, where), tuple(key)).fetchall()
+
+    # get when a group was synced last, None if never
+    def synced_time(self, table, key):
+        row = self.conn.execute('SELECT time FROM synced WHERE state = ?',
+                                ('/'.join((table,) + tuple(key)),)).fetchone()
+        return row[0] if row else None
+
+    # get the keys of the synced groups of a table, the latest synced first
+    def synced_keys(self, table):
+        rows = self.conn.execute('SELECT state FROM synced WHERE state LIKE ? ORDER BY time DESC', (table + '/%',))
+        return [tuple(i[0].split('/')[1:]) for i in rows]
+
+    def usernames(self):
+        return [i[0] for i in self.conn.execute('SELECT DISTINCT username FROM students ORDER BY username')]
+
+    # get the id of a semester like '2016-2017:2', None if unknown
+    def find_semester_id(self, semester):
+        school_year, _, name = semester.partition(':')
+        row = self.conn.execute('SELECT id FROM semesters WHERE school_year = ? AND name = ?',
+                                (school_year, name)).fetchone()
+        return row[0] if row else None
@@ -0,0 +1,157 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : transport.py
+# @Project : NKU-EAMIS
+
+"""
+The HTTP transport that every request to EAMIS goes through.
+
+It's a requests session with a pooled keep-alive adapter, default connect/read timeouts, retries with exponential
+backoff and jitter, and a circuit breaker which fails fast after too many consecutive failures. GETs are retried on
+connection errors, timeouts and 5xx; POSTs only when connecting timed out, since the request may have reached the
+server otherwise. An optional rate limiter, shared by forked sessions, spaces out the requests (and retries) of all
+of them, e.g. in the batch mode.
+"""
+
+import time
+import random
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit
+from . import profiling
+
+TIMEOUT = (5, 30)  # connect, read
+RETRIES = 3
+BACKOFF = 0.5
+POOL_SIZE = 10
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 30
+
+
+class CircuitOpenError(requests.ConnectionError):
+    pass
+
+
+class CircuitBreaker(object):
+    def __init__(self, threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened = None  # when the circuit was opened
+        self.lock = threading.Lock()
+
+    # raise CircuitOpenError when the circuit is open, let one trial through after reset_timeout
+    def before(self):
+        with self.lock:
+            if self.opened is None:
+                return
+            if time.time() - self.opened < self.reset_timeout:
+                raise CircuitOpenError('NKU-EAMIS seems to be down, not retrying for %.0fs'
+                                       % (self.reset_timeout - time.time() + self.opened))
+            self.opened = time.time()  # half open, the others still fail fast until the trial is done
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened = None
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened = time.time()
+
+
+# a limit of requests per second shared by threads, letting a burst of requests through at once
+class RateLimiter(object):
+    def __init__(self, rate, burst=1):
+        self.interval = 1.0 / rate
+        self.burst = burst
+        self.next_time = time.monotonic()  # when the next request would be due at the steady rate
+        self.lock = threading.Lock()
+
+    # block until the next request is allowed
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            due = max(self.next_time, now)
+            self.next_time = due + self.interval
+        wait = due - (self.burst - 1) * self.interval - now
+        if wait > 0:
+            time.sleep(wait)
+
+
+class Transport(requests.Session):
+    def __init__(self, timeout=TIMEOUT, retries=RETRIES, backoff=BACKOFF, pool_size=POOL_SIZE, breaker=None,
+                 limiter=None):
+        super(Transport, self).__init__()
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.breaker = breaker or CircuitBreaker()
+        self.limiter = limiter
+        self.owns_adapter = True
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+
+    # get the seconds to wait before the n-th retry
+    def backoff_time(self, n):
+        return self.backoff * 2 ** n * random.uniform(0.5, 1.5)
+
+    # send a request with retries, and record it as a fetch span
+    def request(self, method, url, **kwargs):
+        start = time.perf_counter()
+        response = None
+        try:
+            response = self.send_with_retries(method, url, **kwargs)
+            return response
+        finally:
+            size = redirects = 0
+            if response is not None:
+                if not kwargs.get('stream'):
+                    size = len(response.content)
+                redirects = len(response.history)
+            profiling.record('%s %s' % (method.upper(), urlsplit(url).path), 'fetch',
+                             start, time.perf_counter(), size, redirects)
+
+    def send_with_retries(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        idempotent = method.upper() in ('GET', 'HEAD', 'OPTIONS')
+        n = 0
+        while True:
+            self.breaker.before()
+            if self.limiter:
+                self.limiter.acquire()
+            try:
+                response = super(Transport, self).request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.breaker.failure()
+                if n >= self.retries or not (idempotent or isinstance(e, requests.ConnectTimeout)):
+                    raise
+            else:
+                if response.status_code < 500:
+                    self.breaker.success()
+                    return response
+                self.breaker.failure()
+                if n >= self.retries or not idempotent:
+                    return response
+                response.close()
+            time.sleep(self.backoff_time(n))
+            n += 1
+
+    # get a new session with a copy of the cookies, sharing the connection pool, the circuit breaker and the limiter
+    def fork(self):
+        s = Transport(self.timeout, self.retries, self.backoff, self.pool_size, self.breaker, self.limiter)
+        s.owns_adapter = False
+        for prefix, adapter in self.adapters.items():
+            s.mount(prefix, adapter)
+        s.headers.update(self.headers)
+        s.cookies.update(self.cookies)
+        return s
+
+    def close(self):
+        if self.owns_adapter:
+            super(Transport, self).close()
@@ -0,0 +1,110 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : watch.py
+# @Project : NKU-EAMIS
+
+"""
+Polling of pages for new or changed rows, used by `nkueamis --watch`.
+
+A WatchSource sends conditional GETs (If-None-Match / If-Modified-Since) when the server gave an ETag or a
+Last-Modified, and hashes the raw body otherwise, so that an unchanged page is never parsed. A changed page is parsed
+into rows keyed by something stable, e.g. the category and name of a grade, and only the rows that are new or
+differ from the last snapshot become events. The first poll of a source takes the snapshot without any events.
+A failed poll, e.g. while the network is down, keeps the snapshot and is tried again after a longer interval.
+"""
+
+import json
+import time
+import random
+import hashlib
+import subprocess
+
+JITTER = 0.1  # the interval varies by this ratio either way
+MAX_BACKOFF = 8  # the interval grows up to this many times while the polls fail
+
+
+class WatchSource(object):
+    def __init__(self, name, fetch, parse):
+        self.name = name
+        self.fetch = fetch  # headers -> response
+        self.parse = parse  # page content -> {key: record}
+        self.etag = None
+        self.last_modified = None
+        self.content_hash = None
+        self.rows = None  # the last snapshot
+        self.polls = 0
+        self.parses = 0
+
+    # fetch the page, return the events of the rows new or changed since the last poll
+    def poll(self):
+        self.polls += 1
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        response = self.fetch(headers)
+        if response.status_code == 304:
+            return []
+        self.etag = response.headers.get('ETag')
+        self.last_modified = response.headers.get('Last-Modified')
+        content_hash = hashlib.sha1(response.content).hexdigest()
+        if content_hash == self.content_hash:
+            return []
+        self.content_hash = content_hash
+        self.parses += 1
+        rows = self.parse(response.content.decode())
+        events = [] if self.rows is None else diff_rows(self.rows, rows)
+        self.rows = rows
+        return events
+
+
+# get the records of the rows new or changed in new, with a 'change' of 'new' or 'changed'
+def diff_rows(old, new):
+    events = []
+    for key, record in new.items():
+        if key not in old:
+            events.append(dict(record, change='new'))
+        elif old[key] != record:
+            events.append(dict(record, change='changed'))
+    return events
+
+
+# key the records by some of their fields, numbering the records with the same fields
+def key_records(records, fields):
+    rows = {}
+    seen = {}
+    for record in records:
+        key = tuple(record[i] for i in fields)
+        seen[key] = seen.get(key, -1) + 1
+        rows[key + (seen[key],)] = record
+    return rows
+
+
+# run a shell command once for every event, with the event as JSON on its stdin
+def run_hook(command, events):
+    for event in events:
+        subprocess.run(command, shell=True, input=json.dumps(event, ensure_ascii=False).encode())
+
+
+# poll the sources forever, at an interval with jitter, passing every non-empty batch of events to on_events
+# a poll failing with one of errors is passed to on_error(source, error, seconds to the next round) instead of ending
+# the watch, and the interval doubles after every round with a failure, up to MAX_BACKOFF times, until one succeeds
+def watch(sources, interval, on_events, sleep=time.sleep, errors=(), on_error=None):
+    backoff = 1
+    while True:
+        events = []
+        failed = []
+        for source in sources:
+            try:
+                events += source.poll()
+            except errors as e:
+                failed.append((source, e))
+        if events:
+            on_events(events)
+        backoff = min(backoff * 2, MAX_BACKOFF) if failed else 1
+        delay = interval * backoff * random.uniform(1 - JITTER, 1 + JITTER)
+        if on_error:
+            for source, e in failed:
+                on_error(source, e, delay)
+        sleep(delay)
@@ -26,6 +26,7 @@ setup(
     license = 'MIT',
     packages = find_packages(),
     install_requires=['docopt', 'requests', 'bs4', 'prettytable'],
+    extras_require={'analytics': ['numpy']},
     entry_points={
         'console_scripts':[
             'nkueamis=nkueamis.nkueamis:main'
@@ -0,0 +1,27 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : support.py
+# @Project : NKU-EAMIS
+
+"""
+The stand-in server shared by the tests, started before nkueamis is imported so that its URLs point at it, and an
+empty cache directory for the run.
+"""
+
+import os
+import tempfile
+
+from nkueamis.standin import StandIn
+
+standin = StandIn(size=20).start()
+os.environ['NKUEAMIS_HOME_URL'] = standin.url
+os.environ['XDG_CACHE_HOME'] = tempfile.mkdtemp(prefix='nkueamis-test-')
+
+from nkueamis import nkueamis  # noqa: E402
+
+
+# log in to the stand-in with a new session, with the request counts reset afterwards
+def logged_in_session(username='20170001'):
+    sess = nkueamis.log_in(username, 'pw')
+    standin.reset_counts()
+    return sess
@@ -0,0 +1,54 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : test_analytics.py
+# @Project : NKU-EAMIS
+
+import io
+import sys
+import unittest
+import contextlib
+
+import numpy as np
+
+from nkueamis import analytics
+
+RECORDS = [
+    {'type': 'student', 'username': '20170001'},
+    {'type': 'grade', 'username': '20170001', 'semester': '2018-2019:1', 'category': 'A', 'credit': 3, 'score': 90},
+    {'type': 'grade', 'username': '20170001', 'semester': '2017-2018:2', 'category': 'B', 'credit': '2',
+     'score': '80 (补考)'},
+    {'type': 'grade', 'username': '20170002', 'semester': '', 'category': 'A', 'credit': '2', 'score': '通过'},
+    {'type': 'grade', 'username': '20170002', 'category': 'C', 'credit': '1', 'score': '70'},
+]
+
+
+class GradeArraysTest(unittest.TestCase):
+    def test_from_records(self):
+        grades = analytics.GradeArrays.from_records(RECORDS)
+        self.assertEqual(grades.usernames, ['20170001', '20170002'])
+        self.assertEqual(grades.semesters, ['2017-2018:2', '2018-2019:1'])
+        self.assertEqual(grades.student.tolist(), [0, 0, 1, 1])
+        self.assertEqual(grades.category.tolist(), [0, 1, 0, 2])
+        self.assertEqual(grades.semester.tolist(), [1, 0, -1, -1])
+        self.assertEqual(grades.credit.tolist(), [3, 2, 2, 1])
+        np.testing.assert_array_equal(grades.score, [90, 80, np.nan, 70])
+        self.assertEqual(grades.unscored, 1)
+        np.testing.assert_array_equal(grades.averages()[0], [86, 70])
+
+    def test_no_grades(self):
+        grades = analytics.GradeArrays.from_records(RECORDS[:1])
+        self.assertEqual(len(grades), 0)
+        self.assertEqual(grades.usernames, [])
+
+
+class MainTest(unittest.TestCase):
+    def test_invalid_categories(self):
+        out = io.StringIO()
+        argv, sys.argv = sys.argv, ['analytics', 'cohort.jsonl', '-g', 'abf']
+        try:
+            with contextlib.redirect_stdout(out), self.assertRaises(SystemExit) as context:
+                analytics.main()
+        finally:
+            sys.argv = argv
+        self.assertEqual(context.exception.code, 1)
+        self.assertIn('Invalid categories abf', out.getvalue())
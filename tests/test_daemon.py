@@ -0,0 +1,94 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : test_daemon.py
+# @Project : NKU-EAMIS
+
+import json
+import asyncio
+import unittest
+
+from tests.support import standin, nkueamis
+from nkueamis.daemon import Daemon, Resource
+
+TOKEN = 'secret'
+
+
+class Session(object):
+    def fork(self):
+        return self
+
+    def close(self):
+        pass
+
+
+class DaemonTestCase(unittest.TestCase):
+    def tearDown(self):
+        self.daemon.close()
+
+    # send requests to the daemon in turn, return their (status, body)
+    def requests(self, *requests, token=TOKEN):
+        headers = {'authorization': 'Bearer %s' % token} if token else {}
+
+        async def run():
+            return [await self.daemon.dispatch(method, target, json.dumps(body).encode() if body else b'', headers)
+                    for method, target, body in requests]
+        return asyncio.run(run())
+
+
+class DaemonTest(DaemonTestCase):
+    def setUp(self):
+        self.logins = []
+        resources = [Resource('grades', lambda sess, params: ['A'], lambda model, query: model, 60)]
+        self.daemon = Daemon(resources, self.open_session, lambda sess: True, 2, TOKEN)
+
+    def open_session(self, username, password):
+        self.logins.append((username, password))
+        return Session() if password == 'pw' else None
+
+    def test_token_required(self):
+        for token in (None, 'wrong'):
+            status, body = self.requests(('GET', '/stats', None), token=token)[0]
+            self.assertEqual(status, 401)
+        self.assertEqual(self.requests(('GET', '/stats', None))[0][0], 200)
+
+    def test_no_token_for_unix_socket(self):
+        self.daemon.token = None
+        self.assertEqual(self.requests(('GET', '/stats', None), token=None)[0][0], 200)
+
+    def test_not_served_without_login(self):
+        status, body = self.requests(('GET', '/users/20170001/grades', None))[0]
+        self.assertEqual(status, 401)
+        self.assertEqual(self.logins, [])
+
+    def test_login_needs_password(self):
+        status, body = self.requests(('POST', '/login', {'username': '20170001'}))[0]
+        self.assertEqual(status, 400)
+        status, body = self.requests(('POST', '/login', {'username': '20170001', 'password': 'wrong'}))[0]
+        self.assertEqual(status, 401)
+        self.assertEqual(self.logins, [('20170001', 'wrong')])
+
+    def test_served_after_login(self):
+        responses = self.requests(('POST', '/login', {'username': '20170001', 'password': 'pw'}),
+                                  ('GET', '/users/20170001/grades', None),
+                                  ('GET', '/users/20170002/grades', None))
+        self.assertEqual([i[0] for i in responses], [200, 200, 401])
+        self.assertEqual(responses[1][1], ['A'])
+
+
+class StandInDaemonTest(DaemonTestCase):
+    def setUp(self):
+        self.daemon = Daemon(nkueamis.daemon_resources(), nkueamis.open_session, nkueamis.is_logged_in, 2, TOKEN)
+
+    # the course tables of project 2 switch the server-side session, which must be back on project 1 afterwards
+    def test_grades_after_courses(self):
+        responses = self.requests(('POST', '/login', {'username': '20170001', 'password': 'pw'}),
+                                  ('GET', '/users/20170001/courses', None),
+                                  ('GET', '/users/20170001/grades', None))
+        self.assertEqual([i[0] for i in responses], [200, 200, 200])
+        self.assertTrue(responses[1][1])
+        grades = [i for i in responses[2][1] if i['type'] == 'grade']
+        self.assertEqual(len(grades), standin.size * len(nkueamis.COURSE_CAT))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : test_elect.py
+# @Project : NKU-EAMIS
+
+import unittest
+
+from tests.support import standin, nkueamis, logged_in_session
+
+PAGE = 'GET /eams/stdElectCourse!defaultPage.action'
+INDEX = 'GET /eams/stdElectCourse!innerIndex.action'
+DATA = 'GET /eams/stdElectCourse!data.action'
+POST = 'POST /eams/stdElectCourse!batchOperator.action'
+
+
+class ElectClientTest(unittest.TestCase):
+    def setUp(self):
+        nkueamis.loaded_catalogs.clear()
+        self.sess = logged_in_session()
+        self.client = nkueamis.ElectClient(self.sess)
+
+    def tearDown(self):
+        self.sess.close()
+
+    def test_resolves_once_and_posts_one_batch_per_cycle(self):
+        course_ids = [nkueamis.course_no2id(self.client, no) for no in ('0001', '0002')]
+        for cycle in range(3):
+            result = self.client.operate([(i, 'true') for i in course_ids])
+            self.assertTrue(all(result[i] for i in course_ids))
+        self.assertEqual(standin.counts[INDEX], 1)
+        self.assertEqual(standin.counts[PAGE], 1)
+        self.assertLessEqual(standin.counts[DATA], 1)
+        self.assertEqual(standin.counts[POST], 3)
+        self.assertEqual(standin.total_requests(), 5 + standin.counts[DATA])
+        self.assertTrue(set(course_ids) <= self.client.elected)
+
+    def test_drop(self):
+        course_id = nkueamis.course_no2id(self.client, '0003')
+        self.client.operate([(course_id, 'true')])
+        self.assertIn('退课成功', self.client.operate([(course_id, 'false')])[course_id])
+        self.assertNotIn(course_id, self.client.elected)
+        self.assertEqual(standin.counts[PAGE], 1)
+
+
+    # find an electable course conflicting with the timetable only through the course of an id
+    def conflicting_only_with(self, course_id):
+        index = self.client.conflict_index()
+        name = self.client.catalog().by_id[course_id][2]
+        for i in self.client.catalog().by_id:
+            if i != course_id and i not in self.client.elected and index.conflicts_with(i) == [name]:
+                return i
+        self.fail('no course conflicts only with %s' % course_id)
+
+    def test_conflicts_follow_elections_and_drops(self):
+        index = self.client.conflict_index()
+        free = [i for i in self.client.catalog().by_id if i not in self.client.elected and not index.conflicts(i)]
+
+        # the slot of an elected course is busy
+        self.client.operate([(free[0], 'true')])
+        course_id = self.conflicting_only_with(free[0])
+        self.assertEqual(nkueamis.drop_conflicted_courses(self.client, [course_id]), [])
+
+        # and the slot of a dropped course is free again
+        self.client.operate([(free[0], 'false')])
+        self.assertEqual(nkueamis.drop_conflicted_courses(self.client, [course_id]), [course_id])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : test_parallel.py
+# @Project : NKU-EAMIS
+
+import io
+import json
+import itertools
+import unittest
+
+from tests.support import standin, nkueamis, logged_in_session
+from nkueamis.records import RecordWriter
+
+ARGS = {'-g': True, '<course_category>': 'ABCDE', '-c': True, '-e': True, '--to': None, '<semester>': None,
+        '<username>': '20170001'}
+
+
+class ParallelQueriesTest(unittest.TestCase):
+    def setUp(self):
+        standin.clear_faults()
+        self.sess = logged_in_session()
+
+    def tearDown(self):
+        standin.clear_faults()
+        self.sess.close()
+
+    def test_records_in_serial_order(self):
+        # the std detail and the grades answer last
+        standin.inject_fault('slow', 1, '/eams/stdDetail!innerIndex.action', 0.3)
+        standin.inject_fault('slow', 1, '/eams/myPlanCompl!innerIndex.action', 0.2)
+        out = io.StringIO()
+        writer = RecordWriter('jsonl', out)
+        nkueamis.run_queries_parallel(self.sess, ARGS, None, writer)
+        writer.close()
+        types = [key for key, group in itertools.groupby(json.loads(i)['type'] for i in out.getvalue().splitlines())]
+        self.assertEqual(types, ['student', 'grade', 'grade_summary', 'course', 'exam'])
+
+
+if __name__ == '__main__':
+    unittest.main()
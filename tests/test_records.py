@@ -0,0 +1,48 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : test_records.py
+# @Project : NKU-EAMIS
+
+import io
+import json
+import time
+import threading
+import unittest
+
+from nkueamis.records import RecordWriter
+
+
+# records yielding to other threads between them, as the parsers of a query may
+def slow_records(name, n):
+    for i in range(n):
+        time.sleep(0.001)
+        yield {'type': 'grade', 'name': '%s%d' % (name, i)}
+
+
+class RecordWriterTest(unittest.TestCase):
+    def test_tables_not_interleaved(self):
+        out = io.StringIO()
+        writer = RecordWriter('jsonl', out)
+
+        def write(name):
+            writer.bind(username=name).write_all(slow_records(name, 50))
+        threads = [threading.Thread(target=write, args=(i,)) for i in 'ab']
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        writer.close()
+        names = [json.loads(line)['username'] for line in out.getvalue().splitlines()]
+        self.assertEqual(sorted(names), ['a'] * 50 + ['b'] * 50)
+        self.assertEqual(names[:50], [names[0]] * 50)
+
+    def test_json_array(self):
+        out = io.StringIO()
+        writer = RecordWriter('json', out)
+        writer.write_all([{'type': 'exam', 'name': 'x'}, {'type': 'exam', 'name': 'y'}])
+        writer.close()
+        self.assertEqual([i['name'] for i in json.loads(out.getvalue())], ['x', 'y'])
+
+
+if __name__ == '__main__':
+    unittest.main()
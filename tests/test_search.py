@@ -0,0 +1,43 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : test_search.py
+# @Project : NKU-EAMIS
+
+import unittest
+
+from nkueamis.search import CourseIndex
+
+COURSES = [
+    ('1', '0001', '高等数学Ⅱ', '李芳,张伟', '主楼101,一教202'),
+    ('2', '0002', '高等数学Ⅰ', '王强', '二主楼303'),
+    ('3', '0003', '大学英语', '刘张', '一教101'),
+]
+
+
+class CourseIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = CourseIndex(COURSES)
+
+    def ids(self, query):
+        return [i[0] for i in self.index.search(query)]
+
+    def test_substring(self):
+        self.assertEqual(self.ids('高等数学'), ['1', '2'])
+        self.assertEqual(self.ids('张'), ['1', '3'])
+        self.assertEqual(self.ids('数学 ii'), ['1'])
+
+    def test_prefix_of_any_teacher(self):
+        self.assertEqual(self.ids('^张'), ['1'])
+        self.assertEqual(self.ids('高等数学 ^张'), ['1'])
+        self.assertEqual(self.ids('^李'), ['1'])
+
+    def test_prefix_of_any_room(self):
+        self.assertEqual(self.ids('^一教'), ['1', '3'])
+
+    def test_prefix_of_a_field(self):
+        self.assertEqual(self.ids('^高等'), ['1', '2'])
+        self.assertEqual(self.ids('^数学'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : test_semesters.py
+# @Project : NKU-EAMIS
+
+import os
+import json
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from tests.support import standin, nkueamis, logged_in_session
+from nkueamis import semesters
+from nkueamis.session_cache import write_private_file
+
+QUERY = 'POST /eams/dataQuery.action'
+
+
+class WritePrivateFileTest(unittest.TestCase):
+    def test_concurrent_writes(self):
+        path = os.path.join(tempfile.mkdtemp(prefix='nkueamis-test-'), 'index.json')
+        with ThreadPoolExecutor(16) as executor:
+            list(executor.map(lambda i: write_private_file(path, json.dumps({'n': i})), range(200)))
+        with open(path) as f:
+            self.assertIn(json.load(f)['n'], range(200))
+        self.assertEqual(os.listdir(os.path.dirname(path)), ['index.json'])
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
+
+
+class SemesterIndexTest(unittest.TestCase):
+    def setUp(self):
+        nkueamis.semester_index = None
+        if os.path.exists(semesters.index_path()):
+            os.remove(semesters.index_path())
+        self.sess = logged_in_session()
+
+    def tearDown(self):
+        self.sess.close()
+
+    def test_concurrent_misses_download_once(self):
+        with ThreadPoolExecutor(16) as executor:
+            ids = list(executor.map(lambda i: nkueamis.determine_semester_id(self.sess, '2016-2017:2'), range(16)))
+        self.assertEqual(len(set(ids)), 1)
+        self.assertEqual(standin.counts[QUERY], 1)
+        self.assertEqual(semesters.load_index().id_of('2016-2017:2'), ids[0])
+
+    def test_unknown_semester(self):
+        with self.assertRaises(nkueamis.QueryError):
+            nkueamis.determine_semester_id(self.sess, '1999-2000:1')
+
+
+if __name__ == '__main__':
+    unittest.main()
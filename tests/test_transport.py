@@ -0,0 +1,173 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : test_transport.py
+# @Project : NKU-EAMIS
+
+import time
+import unittest
+
+import requests
+
+from tests.support import standin
+from nkueamis.transport import Transport, CircuitBreaker, CircuitOpenError, RateLimiter
+
+LOGIN = '/eams/login.action'
+
+
+# a transport recording the seconds it waits before each retry
+class RecordingTransport(Transport):
+    def __init__(self, **kwargs):
+        kwargs.setdefault('backoff', 0.01)
+        super(RecordingTransport, self).__init__(**kwargs)
+        self.waits = []
+
+    def backoff_time(self, n):
+        wait = super(RecordingTransport, self).backoff_time(n)
+        self.waits.append(wait)
+        return wait
+
+
+class TransportTest(unittest.TestCase):
+    def setUp(self):
+        standin.clear_faults()
+        standin.reset_counts()
+        self.sess = RecordingTransport()
+
+    def tearDown(self):
+        standin.clear_faults()
+        self.sess.close()
+
+    def test_get_retried_with_backoff_on_5xx(self):
+        standin.inject_fault('error', 2, LOGIN)
+        self.assertEqual(self.sess.get(standin.url + LOGIN).status_code, 200)
+        self.assertEqual(standin.counts['GET ' + LOGIN], 3)
+        self.assertEqual(len(self.sess.waits), 2)
+        for n, wait in enumerate(self.sess.waits):
+            self.assertTrue(0.5 * 0.01 * 2 ** n <= wait <= 1.5 * 0.01 * 2 ** n)
+
+    def test_get_gives_up_after_retries(self):
+        standin.inject_fault('error', 10, LOGIN)
+        self.assertEqual(self.sess.get(standin.url + LOGIN).status_code, 503)
+        self.assertEqual(standin.counts['GET ' + LOGIN], self.sess.retries + 1)
+
+    def test_get_retried_on_reset(self):
+        standin.inject_fault('reset', 1, LOGIN)
+        self.assertEqual(self.sess.get(standin.url + LOGIN).status_code, 200)
+        self.assertEqual(standin.counts['GET ' + LOGIN], 2)
+
+    def test_post_not_retried(self):
+        standin.inject_fault('error', 1, LOGIN)
+        self.assertEqual(self.sess.post(standin.url + LOGIN, data={'username': '1'}).status_code, 503)
+        standin.inject_fault('reset', 1, LOGIN)
+        with self.assertRaises(requests.ConnectionError):
+            self.sess.post(standin.url + LOGIN, data={'username': '1'})
+        self.assertEqual(standin.counts['POST ' + LOGIN], 2)
+
+    def test_read_timeout(self):
+        sess = RecordingTransport(timeout=(1, 0.2), retries=1)
+        try:
+            standin.inject_fault('slow', 1, LOGIN, 0.5)
+            self.assertEqual(sess.get(standin.url + LOGIN).status_code, 200)
+            standin.inject_fault('slow', 2, LOGIN, 0.5)
+            with self.assertRaises(requests.ReadTimeout):
+                sess.get(standin.url + LOGIN)
+            self.assertEqual(standin.counts['GET ' + LOGIN], 4)
+            standin.inject_fault('slow', 1, LOGIN, 0.5)
+            with self.assertRaises(requests.ReadTimeout):
+                sess.post(standin.url + LOGIN, data={'username': '1'})
+            self.assertEqual(standin.counts['POST ' + LOGIN], 1)
+        finally:
+            sess.close()
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        standin.clear_faults()
+        standin.reset_counts()
+        self.breaker = CircuitBreaker(threshold=2, reset_timeout=0.2)
+        self.sess = Transport(retries=0, breaker=self.breaker)
+
+    def tearDown(self):
+        standin.clear_faults()
+        self.sess.close()
+
+    def open_circuit(self):
+        standin.inject_fault('error', 2, LOGIN)
+        for i in range(2):
+            self.assertEqual(self.sess.get(standin.url + LOGIN).status_code, 503)
+
+    def test_open_fails_fast(self):
+        self.open_circuit()
+        with self.assertRaises(CircuitOpenError):
+            self.sess.get(standin.url + LOGIN)
+        self.assertEqual(standin.counts['GET ' + LOGIN], 2)
+
+    def test_half_open_success_closes(self):
+        self.open_circuit()
+        time.sleep(0.25)
+        self.assertEqual(self.sess.get(standin.url + LOGIN).status_code, 200)
+        self.assertIsNone(self.breaker.opened)
+        self.assertEqual(self.sess.get(standin.url + LOGIN).status_code, 200)
+
+    def test_half_open_failure_opens_again(self):
+        self.open_circuit()
+        time.sleep(0.25)
+        standin.inject_fault('error', 1, LOGIN)
+        self.assertEqual(self.sess.get(standin.url + LOGIN).status_code, 503)
+        with self.assertRaises(CircuitOpenError):
+            self.sess.get(standin.url + LOGIN)
+        self.assertEqual(standin.counts['GET ' + LOGIN], 3)
+
+    def test_half_open_lets_one_trial_through(self):
+        self.breaker.failure()
+        self.breaker.failure()
+        time.sleep(0.25)
+        self.breaker.before()
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before()
+
+    def test_shared_by_forks(self):
+        fork = self.sess.fork()
+        try:
+            self.open_circuit()
+            with self.assertRaises(CircuitOpenError):
+                fork.get(standin.url + LOGIN)
+        finally:
+            fork.close()
+
+
+class RateLimiterTest(unittest.TestCase):
+    def test_spaces_out_requests(self):
+        limiter = RateLimiter(20)
+        start = time.monotonic()
+        for i in range(5):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 4 * 0.05 * 0.9)
+
+    def test_burst(self):
+        limiter = RateLimiter(5, burst=3)
+        start = time.monotonic()
+        for i in range(3):
+            limiter.acquire()
+        self.assertLess(time.monotonic() - start, 0.1)
+        limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.2 * 0.9)
+
+    def test_shared_by_forks(self):
+        standin.reset_counts()
+        sess = Transport(limiter=RateLimiter(20))
+        fork = sess.fork()
+        try:
+            start = time.monotonic()
+            for i in range(3):
+                sess.get(standin.url + LOGIN)
+                fork.get(standin.url + LOGIN)
+            self.assertGreaterEqual(time.monotonic() - start, 5 * 0.05 * 0.9)
+            self.assertEqual(standin.counts['GET ' + LOGIN], 6)
+        finally:
+            fork.close()
+            sess.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
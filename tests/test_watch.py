@@ -0,0 +1,72 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : test_watch.py
+# @Project : NKU-EAMIS
+
+import unittest
+
+import requests
+
+from nkueamis import watch
+
+
+class Response(object):
+    def __init__(self, text):
+        self.status_code = 200
+        self.headers = {}
+        self.content = text.encode()
+
+
+class Stop(Exception):
+    pass
+
+
+class WatchTest(unittest.TestCase):
+    def setUp(self):
+        self.delays = []
+
+    # a sleep stopping the watch after some rounds
+    def sleep(self, rounds):
+        def sleep(delay):
+            self.delays.append(delay)
+            if len(self.delays) >= rounds:
+                raise Stop()
+        return sleep
+
+    # a source answering the pages in turn, raising the exceptions among them
+    def source(self, pages):
+        pages = iter(pages)
+
+        def fetch(headers):
+            page = next(pages)
+            if isinstance(page, Exception):
+                raise page
+            return Response(page)
+        return watch.WatchSource('grades', fetch, lambda content: {(i,): {'name': i} for i in content.split()})
+
+    def test_failed_polls_back_off_and_continue(self):
+        source = self.source(['a', requests.ConnectionError('down'), requests.Timeout('slow'), 'a b', 'a b'])
+        events = []
+        errors = []
+        with self.assertRaises(Stop):
+            watch.watch([source], 10, events.extend, self.sleep(5), (requests.RequestException,),
+                        lambda source, error, delay: errors.append(error))
+        self.assertEqual(events, [{'name': 'b', 'change': 'new'}])
+        self.assertEqual([str(i) for i in errors], ['down', 'slow'])
+        factors = [round(i / 10) for i in self.delays]
+        self.assertEqual(factors, [1, 2, 4, 1, 1])
+
+    def test_backoff_is_bounded(self):
+        source = self.source([requests.ConnectionError('down')] * 6)
+        with self.assertRaises(Stop):
+            watch.watch([source], 10, None, self.sleep(6), (requests.RequestException,))
+        self.assertLessEqual(max(self.delays), 10 * watch.MAX_BACKOFF * (1 + watch.JITTER))
+
+    def test_other_errors_end_the_watch(self):
+        source = self.source([ValueError('bad page')])
+        with self.assertRaises(ValueError):
+            watch.watch([source], 10, None, self.sleep(1), (requests.RequestException,))
+
+
+if __name__ == '__main__':
+    unittest.main()